@@ -0,0 +1,219 @@
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.encoding import ObservationEncoder
+from gym_partially_observable_grid.envs import PartiallyObservableWorld
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+from world_scaler import parse_file, create_world
+
+WORLDS = ['worlds/world0.txt', 'worlds/world1.txt', 'worlds/world2.txt', 'worlds/world3.txt']
+SCALES = [(1, 1), (10, 10), (30, 30), (100, 100)]
+
+# Metrics where higher values are better, used when comparing runs
+HIGHER_IS_BETTER = {'steps_per_sec'}
+
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def steps_per_sec(env, num_steps):
+    actions = [random.randrange(4) for _ in range(num_steps)]
+    env.reset()
+    step, reset = env.step, env.reset
+    start = time.perf_counter()
+    for action in actions:
+        if step(action)[2]:
+            reset()
+    return num_steps / (time.perf_counter() - start)
+
+
+def reset_latency(env, num_resets):
+    start = time.perf_counter()
+    for _ in range(num_resets):
+        env.reset()
+    return (time.perf_counter() - start) / num_resets
+
+
+def instance_memory(world_file_path):
+    # Memory retained by a single environment instance, including its parsed and compiled world
+    gc.collect()
+    tracemalloc.start()
+    env = PartiallyObservableWorld(world_file_path, indicate_slip=True, indicate_wall=True)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del env
+    return retained, peak
+
+
+def shared_instance_memory(world_file_path):
+    # Memory retained by a further environment instance, which shares the layout of the first one
+    env = PartiallyObservableWorld(world_file_path, indicate_slip=True, indicate_wall=True)
+    gc.collect()
+    tracemalloc.start()
+    other = PartiallyObservableWorld(world_file_path, indicate_slip=True, indicate_wall=True)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del env, other
+    return retained
+
+
+def import_time(module='gym_partially_observable_grid', repeats=5, preload=()):
+    # Cold import time, measured in fresh interpreters in which the preload modules are already imported
+    code = (''.join(f'import {name}; ' for name in preload) +
+            f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)')
+    timings = [float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout)
+               for _ in range(repeats)]
+    return min(timings)
+
+
+def benchmark_world(world_file_path, num_steps, cache_dir):
+    parser = PartiallyObsGridworldParser(world_file_path)
+    compiled_world = CompiledWorld(parser)
+    retained, peak = instance_memory(world_file_path)
+    result = {
+        'cells': compiled_world.n_cells,
+        'parse_time': best_of(lambda: PartiallyObsGridworldParser(world_file_path), 3),
+        'compile_time': best_of(lambda: CompiledWorld(parser), 3),
+        'obs_space_time': best_of(lambda: ObservationEncoder(compiled_world, True, True), 3),
+        'instance_memory': retained,
+        'instance_peak_memory': peak,
+        'shared_instance_memory': shared_instance_memory(world_file_path),
+        'configurations': [],
+    }
+
+    for force_determinism, is_partially_obs, indicate_wall, indicate_slip in itertools.product([True, False],
+                                                                                              repeat=4):
+        env = PartiallyObservableWorld(world_file_path, force_determinism=force_determinism,
+                                       is_partially_obs=is_partially_obs, indicate_wall=indicate_wall,
+                                       indicate_slip=indicate_slip, cache_dir=cache_dir)
+        result['configurations'].append({
+            'force_determinism': force_determinism,
+            'is_partially_obs': is_partially_obs,
+            'indicate_wall': indicate_wall,
+            'indicate_slip': indicate_slip,
+            'steps_per_sec': steps_per_sec(env, num_steps),
+            'reset_latency': reset_latency(env, num_steps // 10),
+        })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results):
+    # (world, scale, configuration, metric) -> value, for comparisons between runs
+    values = {}
+    for run in results['runs']:
+        prefix = f"{run['world']} {run['scale'][0]}x{run['scale'][1]}"
+        for metric, value in run.items():
+            if isinstance(value, (int, float)) and metric != 'cells':
+                values[f'{prefix} {metric}'] = value
+        for configuration in run['configurations']:
+            name = ','.join(k for k, v in configuration.items() if v is True) or 'default'
+            for metric in ['steps_per_sec', 'reset_latency']:
+                values[f'{prefix} [{name}] {metric}'] = configuration[metric]
+    for metric in ['import_time', 'engine_import_time']:
+        if metric in results:
+            values[metric] = results[metric]
+    return values
+
+
+def compare(baseline_path, results, threshold):
+    with open(baseline_path) as file:
+        baseline = flatten(json.load(file))
+    current = flatten(results)
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[key], current[key]
+        if not old or not new:
+            continue
+        # Ratio > 1 means the current run is worse
+        ratio = old / new if key.split()[-1] in HIGHER_IS_BETTER else new / old
+        if ratio > 1 + threshold:
+            regressions += 1
+            print(f'REGRESSION {key}: {old:.6g} -> {new:.6g} ({ratio:.2f}x worse)')
+    print(f'{regressions} regressions above {threshold:.0%} out of {len(baseline.keys() & current.keys())} metrics')
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark step throughput, reset latency and parsing.')
+    arg_parser.add_argument('--worlds', nargs='+', default=WORLDS)
+    arg_parser.add_argument('--scales', nargs='+', default=[f'{x}x{y}' for x, y in SCALES],
+                            help='Repeats of the base world, e.g. 1x1 10x10')
+    arg_parser.add_argument('--steps', type=int, default=50000, help='Steps per configuration')
+    arg_parser.add_argument('--output', default='benchmark_results.json')
+    arg_parser.add_argument('--compare', help='Results of an earlier run to compare against')
+    arg_parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported as regression')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    random.seed(args.seed)
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'steps': args.steps,
+        'import_time': import_time(),
+        # The engine needs NumPy, but not gym
+        'engine_import_time': import_time('gym_partially_observable_grid.engine', preload=['numpy']),
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        for world in args.worlds:
+            parsed_values = parse_file(world)
+            for scale in args.scales:
+                repeat_x, repeat_y = map(int, scale.split('x'))
+                scaled_world = os.path.join(tmp_dir, f'{os.path.basename(world)}_{scale}.txt')
+                create_world(scaled_world, parsed_values, repeat_x, repeat_y)
+
+                run = {'world': world, 'scale': [repeat_x, repeat_y]}
+                run.update(benchmark_world(scaled_world, args.steps, cache_dir))
+                results['runs'].append(run)
+
+                fastest = max(run['configurations'], key=lambda c: c['steps_per_sec'])['steps_per_sec']
+                slowest = min(run['configurations'], key=lambda c: c['steps_per_sec'])['steps_per_sec']
+                print(f"{world} {scale}: {run['cells']} cells, parse {run['parse_time'] * 1000:.1f} ms, "
+                      f"{slowest:,.0f}-{fastest:,.0f} steps/s, {run['instance_memory'] / 2 ** 20:.1f} MiB/instance")
+
+    print(f"import time: {results['import_time'] * 1000:.1f} ms, "
+          f"engine (after NumPy): {results['engine_import_time'] * 1000:.1f} ms")
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        compare(args.compare, results, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
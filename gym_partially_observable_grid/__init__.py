@@ -1,6 +1,21 @@
-from gym.envs.registration import register
+import sys
 
-register(
-     id='poge-v1',
-     entry_point='gym_partially_observable_grid.envs:PartiallyObservableWorld',
- )
\ No newline at end of file
+# Gym environments and their entry points; gym itself is only imported by register_envs
+ENVIRONMENTS = {
+    'poge-v1': 'gym_partially_observable_grid.envs:PartiallyObservableWorld',
+    'poge-vec-v1': 'gym_partially_observable_grid.envs:VectorPartiallyObservableWorld',
+}
+
+
+def register_envs():
+    # Registers the environments with gym; importing gym_partially_observable_grid.envs does so as well
+    from gym.envs.registration import register, registry
+
+    for env_id, entry_point in ENVIRONMENTS.items():
+        if env_id not in registry:
+            register(id=env_id, entry_point=entry_point)
+
+
+# The simulator (see engine.GridEngine) does not need gym, so it is only imported here if the application uses it
+if 'gym' in sys.modules:
+    register_envs()
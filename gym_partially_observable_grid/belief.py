@@ -0,0 +1,171 @@
+import numpy as np
+
+from gym_partially_observable_grid.compiled import TOGGLE
+from gym_partially_observable_grid.planning import TransitionModel, AugmentedTransitionModel
+from gym_partially_observable_grid.rng import generator
+
+
+def _gather(indptr, rows):
+    # Entry indices of the given rows of a sparse table and the number of entries of every row
+    starts, counts = indptr[rows], indptr[rows + 1] - indptr[rows]
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum()), counts
+
+
+def _default_model(env):
+    world = env.compiled_world
+    if not env.force_determinism and world.rule_ids and (world.flags & TOGGLE).any():
+        return AugmentedTransitionModel(world, force_determinism=False, one_time_rewards=False)
+    return TransitionModel(world, env.force_determinism)
+
+
+class BeliefFilter:
+    """
+    Beliefs over the model states (player locations) of num_agents agents acting in the same world, updated from the
+    actions they take and the observation ids they receive. By default, the model is a TransitionModel of the
+    environment, or an AugmentedTransitionModel with one_time_rewards=False if behavioural toggles switch its
+    stochastic tiles on and off, since the TransitionModel assumes they are always on.
+
+    Every entry of the model is labelled with the observation the environment returns for it, so a step is a single
+    sparse pass over the entries of the states the agents may be in: transition probabilities are weighted by the
+    belief and masked by the received observation.
+    With num_particles set, every agent is tracked by that many sampled states instead, so that a step costs the
+    same on worlds of any size. If an observation is impossible under the belief of an agent, its belief starts
+    over from all states that could produce it.
+    """
+
+    def __init__(self, env, model=None, num_agents=1, num_particles=None, seed=None):
+        self.model = model if model is not None else _default_model(env)
+        self.encoder = env.encoder
+        self.num_agents = num_agents
+        self.num_particles = num_particles
+        self.rng = generator(seed)
+
+        model, encoder = self.model, self.encoder
+        world = model.compiled_world
+        n_states = model.n_states
+        indicate_slip = env.indicate_slip and env.is_partially_obs
+
+        # Source state and attempted action of every entry; rows are ordered by action first
+        rows = np.repeat(np.arange(4 * n_states), np.diff(model.indptr))
+        actions, self.entry_source = np.divmod(rows, n_states)
+        cells = model.state_cells[self.entry_source]
+        next_cells = model.state_cells[model.next_state]
+        executed = model.executed_action.astype(np.int64)
+
+        # Observation of every entry, see PartiallyObservableWorld.step: slips are forgotten when passing a door
+        through_door = ~model.blocked & (next_cells != cells + np.array(world.cell_deltas)[executed])
+        slip = (executed != actions) & ~through_door if indicate_slip else np.zeros(len(rows), dtype=bool)
+        walls = model.blocked if encoder.indicate_wall else None
+        self.entry_observation = encoder.encode_batch(next_cells, np.where(slip, executed, -1), walls)
+
+        # Cumulative probability of the entries within their row, for sampling particles
+        cumulative = np.cumsum(model.prob)
+        row_offsets = np.concatenate([[0.], cumulative])[model.indptr[:-1]]
+        self.entry_cdf = cumulative - np.repeat(row_offsets, np.diff(model.indptr))
+
+        self.state_base = encoder.cell_base[model.state_cells]
+        self.reset()
+
+    def reset(self, agents=None):
+        # Belief of the given agents (all by default) is the initial state of the model
+        agents = slice(None) if agents is None else agents
+        if self.num_particles is None:
+            if not hasattr(self, 'beliefs'):
+                self.beliefs = np.zeros((self.num_agents, self.model.n_states))
+            self.beliefs[agents] = 0.
+            self.beliefs[agents, self.model.initial_state] = 1.
+        else:
+            if not hasattr(self, 'particles'):
+                self.particles = np.empty((self.num_agents, self.num_particles), dtype=np.int64)
+            self.particles[agents] = self.model.initial_state
+
+    def _consistent_states(self, observation):
+        # States whose base observation matches an observation id
+        base = observation % self.encoder.n_plain
+        if base >= self.encoder.n_base:
+            base = (base - self.encoder.n_base) // 4
+        return np.flatnonzero(self.state_base == base)
+
+    def step(self, actions, observations):
+        """
+        Updates the beliefs after agents took actions and received observations (one per agent). Returns a boolean
+        array telling which agents received an observation that was impossible under their belief.
+        """
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64), (self.num_agents,))
+        observations = np.broadcast_to(np.asarray(observations, dtype=np.int64), (self.num_agents,))
+        if self.num_particles is None:
+            lost = self._exact_step(actions, observations)
+        else:
+            lost = self._particle_step(actions, observations)
+
+        for agent in np.flatnonzero(lost).tolist():
+            states = self._consistent_states(int(observations[agent]))
+            if self.num_particles is None:
+                self.beliefs[agent] = 0.
+                self.beliefs[agent, states] = 1. / len(states)
+            else:
+                self.particles[agent] = self.rng.choice(states, self.num_particles)
+        return lost
+
+    def _exact_step(self, actions, observations):
+        model, n_states = self.model, self.model.n_states
+        agents, states = np.nonzero(self.beliefs)
+        entries, counts = _gather(model.indptr, actions[agents] * n_states + states)
+        entry_agents = np.repeat(agents, counts)
+
+        weights = np.repeat(self.beliefs[agents, states], counts) * model.prob[entries]
+        weights[self.entry_observation[entries] != observations[entry_agents]] = 0.
+        beliefs = np.bincount(entry_agents * n_states + model.next_state[entries], weights,
+                              self.num_agents * n_states).reshape(self.num_agents, n_states)
+
+        totals = beliefs.sum(axis=1)
+        lost = totals == 0
+        beliefs[~lost] /= totals[~lost, None]
+        self.beliefs = beliefs
+        return lost
+
+    def _particle_step(self, actions, observations):
+        model = self.model
+        rows = actions[:, None] * model.n_states + self.particles
+        starts, counts = model.indptr[rows], model.indptr[rows + 1] - model.indptr[rows]
+
+        # Sample an entry of every row: the first one whose cumulative probability exceeds a uniform draw
+        uniforms = self.rng.random(rows.shape)
+        entries = starts.copy()
+        for outcome in range(1, int(counts.max())):
+            entries += (outcome < counts) & (uniforms >= self.entry_cdf[np.minimum(starts + outcome - 1,
+                                                                                   len(self.entry_cdf) - 1)])
+
+        # Resample among the particles that agree with the observation
+        consistent = self.entry_observation[entries] == observations[:, None]
+        n_consistent = consistent.sum(axis=1)
+        lost = n_consistent == 0
+        order = np.argsort(~consistent, axis=1, kind='stable')
+        picks = (self.rng.random(rows.shape) * np.maximum(n_consistent, 1)[:, None]).astype(np.int64)
+        chosen = np.take_along_axis(order, picks, axis=1)
+        self.particles = np.take_along_axis(model.next_state[entries], chosen, axis=1)
+        return lost
+
+    def state_probabilities(self):
+        # (num_agents, n_states) probabilities of the model states
+        if self.num_particles is None:
+            return self.beliefs
+        offsets = np.arange(self.num_agents)[:, None] * self.model.n_states
+        counts = np.bincount((offsets + self.particles).reshape(-1), minlength=self.num_agents * self.model.n_states)
+        return counts.reshape(self.num_agents, self.model.n_states) / self.num_particles
+
+    def cell_probabilities(self, agent=0):
+        # Probabilities of the player being in each cell, as a dense array over cell ids
+        if self.num_particles is None:
+            weights = self.beliefs[agent]
+            return np.bincount(self.model.state_cells, weights, self.model.compiled_world.n_cells)
+        cells = self.model.state_cells[self.particles[agent]]
+        return np.bincount(cells, minlength=self.model.compiled_world.n_cells) / self.num_particles
+
+    def most_likely_locations(self):
+        # Most likely player location of every agent
+        if self.num_particles is None:
+            states = self.beliefs.argmax(axis=1)
+        else:
+            states = np.array([np.bincount(p).argmax() for p in self.particles])
+        return [self.model.compiled_world.location(cell) for cell in self.model.state_cells[states].tolist()]
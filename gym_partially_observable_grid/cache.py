@@ -0,0 +1,88 @@
+import os
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.encoding import ObservationEncoder
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+
+# Bump whenever the layout of cached arrays changes, so that stale entries are not loaded
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get('POGE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'poge'))
+DEFAULT_MAX_CACHE_SIZE = 2 ** 30
+
+
+def cache_key(world_file_path, is_partially_obs, indicate_wall):
+    import hashlib
+
+    digest = hashlib.sha256(f'v{CACHE_VERSION}-{is_partially_obs}-{indicate_wall}-'.encode())
+    with open(world_file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_world(world_file_path, is_partially_obs=True, indicate_wall=False):
+    compiled_world = CompiledWorld(PartiallyObsGridworldParser(world_file_path))
+    # If abstraction is not defined, environment cannot be partially observable
+    is_partially_obs = is_partially_obs and compiled_world.abstract_tiles is not None
+    return compiled_world, ObservationEncoder(compiled_world, is_partially_obs, indicate_wall)
+
+
+def load_world(world_file_path, is_partially_obs=True, indicate_wall=False, cache_dir=None,
+               max_cache_size=DEFAULT_MAX_CACHE_SIZE):
+    """
+    Compiled world and observation encoder of a world file. If cache_dir is given, they are stored in the cache
+    under a key derived from the file content and options, and later loads memory-map them instead of parsing.
+    Least recently used entries are evicted once the cache grows beyond max_cache_size bytes.
+    """
+    if cache_dir is None:
+        return compile_world(world_file_path, is_partially_obs, indicate_wall)
+    import shutil
+    import tempfile
+
+    entry = os.path.join(cache_dir, cache_key(world_file_path, is_partially_obs, indicate_wall))
+    if os.path.isdir(entry):
+        try:
+            compiled_world, encoder = CompiledWorld.load(entry), ObservationEncoder.load(entry)
+            # Mark the entry as recently used
+            os.utime(entry)
+            return compiled_world, encoder
+        except (OSError, ValueError, KeyError):
+            # Entry was evicted or is corrupt, compile the world again
+            shutil.rmtree(entry, ignore_errors=True)
+
+    compiled_world, encoder = compile_world(world_file_path, is_partially_obs, indicate_wall)
+
+    # Write the entry next to its final location and move it there atomically, so that concurrent workers
+    # never see partial entries
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix='.staging-')
+    compiled_world.save(staging)
+    encoder.save(staging)
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # Another process stored the same entry in the meantime
+        shutil.rmtree(staging, ignore_errors=True)
+
+    evict(cache_dir, max_cache_size, keep=entry)
+    return CompiledWorld.load(entry), ObservationEncoder.load(entry)
+
+
+def _entry_size(entry):
+    return sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+
+
+def evict(cache_dir, max_cache_size, keep=None):
+    import shutil
+
+    entries = [e for e in os.scandir(cache_dir) if e.is_dir() and not e.name.startswith('.')]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    total_size = sum(_entry_size(e.path) for e in entries)
+    for entry in entries:
+        if total_size <= max_cache_size:
+            break
+        if entry.path == keep:
+            continue
+        total_size -= _entry_size(entry.path)
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,235 @@
+import os
+from functools import cached_property
+
+import numpy as np
+
+from gym_partially_observable_grid.utils import StochasticTile
+
+# Cell flags
+WALL = 1
+DOOR = 2
+GOAL = 4
+TERMINAL = 8
+TOGGLE = 16
+REWARD = 32
+STOCHASTIC = 64
+
+# (dx, dy) of each action, in the order of actions_dict: up, down, left, right
+ACTION_DELTAS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Number of cells for which next_cell is computed at once, bounding the temporaries of large worlds
+_BLOCK_CELLS = 1 << 18
+
+
+class CompiledWorld:
+    """
+    Integer-indexed form of a parsed world. Cell (x, y) has the id x * width + y and all per-cell information is
+    stored in flat arrays, so that a step of the environment is a handful of array lookups.
+    Compiled worlds can be saved and loaded (memory-mapped) without parsing the world file again.
+    """
+
+    # Arrays written by save; abstract_tiles is None for worlds without abstraction
+    _ARRAYS = ('tiles', 'abstract_tiles', 'flags', 'rewards', 'rule_index', 'slip_actions', 'slip_cdf', 'next_cell')
+
+    def __init__(self, parser):
+        self.height, self.width = parser.height, parser.width
+        self.n_cells = self.height * self.width
+        self.state_space = parser.state_space
+
+        self.tiles = parser.layout.reshape(-1).copy()
+        self.abstract_tiles = parser.abstract_layout.reshape(-1).copy() if parser.abstract_layout is not None else None
+        self.abstract_symbol_name_map = parser.abstract_symbol_name_map
+        self.rules = parser.rules
+
+        self.flags = np.zeros(self.n_cells, dtype=np.uint8)
+        for symbol, flag in [('#', WALL), ('D', DOOR), ('G', GOAL), ('T', TERMINAL), ('@', TOGGLE)]:
+            self.flags[self.tiles == ord(symbol)] |= flag
+
+        # Reward of each reward tile, 0 elsewhere, in the smallest integer type (at least int16) that holds them
+        symbol_rewards = dict()
+        if parser.rewards_layout is not None:
+            symbol_rewards = {symbol: reward for symbol, reward in parser.symbol_reward_map.items()
+                              if len(symbol) == 1 and symbol not in '#DG '}
+        low, high = min(symbol_rewards.values(), default=0), max(symbol_rewards.values(), default=0)
+        reward_dtype = next(dtype for dtype in (np.int16, np.int32, np.int64)
+                            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+        self.rewards = np.zeros(self.n_cells, dtype=reward_dtype)
+        if symbol_rewards:
+            reward_symbols = parser.rewards_layout.reshape(-1)
+            for symbol, reward in symbol_rewards.items():
+                is_reward = reward_symbols == ord(symbol)
+                self.rewards[is_reward] = reward
+                self.flags[is_reward] |= REWARD
+
+        # Index of the rule (in rule_ids) assigned to the cell, -1 if the cell is deterministic
+        self.rule_ids = list(parser.rules.keys())
+        self.rule_index = np.full(self.n_cells, -1, dtype=np.int16)
+        if parser.behaviour_layout is not None:
+            rule_symbols = parser.behaviour_layout.reshape(-1)
+            for index, rule_id in enumerate(self.rule_ids):
+                if len(rule_id) == 1:
+                    self.rule_index[rule_symbols == ord(rule_id)] = index
+            self.flags[self.rule_index >= 0] |= STOCHASTIC
+
+        # Executed actions and their cumulative distributions per (rule, action), padded to 4 outcomes.
+        # Actions without stochastic behaviour have their own action as the only outcome.
+        n_rules = len(self.rule_ids)
+        self.slip_actions = np.tile(np.arange(4, dtype=np.int8)[None, :, None], (n_rules, 1, 4))
+        self.slip_cdf = np.ones((n_rules, 4, 4), dtype=np.float64)
+        for index, rule_id in enumerate(self.rule_ids):
+            for action, (new_actions, cdf) in parser.rules[rule_id].samplers.items():
+                self.slip_actions[index, action, :len(new_actions)] = new_actions
+                self.slip_cdf[index, action, :len(cdf)] = cdf
+
+        self.initial_cell = self.cell(parser.initial_location)
+
+        # Cell reached by executing an action in a cell, -1 if the agent runs into a wall.
+        # Doors are passed through, that is, the move is performed once more from the door tile.
+        self.next_cell = np.empty((self.n_cells, 4), dtype=np.int32)
+        self._fill_next_cell()
+
+    def _fill_next_cell(self):
+        # Tiles with a border of two cells outside of the grid (0), so that the neighbours of a block of rows are
+        # slices; ids are cell + delta in int32, computed one block of rows at a time
+        height, width = self.height, self.width
+        padded = np.zeros((height + 4, width + 4), dtype=np.uint8)
+        padded[2:-2, 2:-2] = self.tiles.reshape(height, width)
+        block_rows = max(1, _BLOCK_CELLS // width)
+        for start in range(0, height, block_rows):
+            stop = min(start + block_rows, height)
+            cells = np.arange(start * width, stop * width, dtype=np.int32).reshape(stop - start, width)
+            for action, (dx, dy) in enumerate(ACTION_DELTAS):
+                delta = dx * width + dy
+                target = padded[start + 2 + dx:stop + 2 + dx, 2 + dy:width + 2 + dy]
+                beyond = padded[start + 2 + 2 * dx:stop + 2 + 2 * dx, 2 + 2 * dy:width + 2 + 2 * dy]
+                next_cell = np.where(target == ord('D'), np.where(beyond != 0, cells + 2 * delta, -1), cells + delta)
+                next_cell[(target == 0) | (target == ord('#'))] = -1
+                self.next_cell[start * width:stop * width, action] = next_cell.reshape(-1)
+
+    @property
+    def cell_deltas(self):
+        # Difference of cell ids after a single (not door-skipping) move
+        return tuple(dx * self.width + dy for dx, dy in ACTION_DELTAS)
+
+    def _rows(self, tiles):
+        return [list(tiles[x * self.width:(x + 1) * self.width].tobytes().decode('latin-1'))
+                for x in range(self.height)]
+
+    def _locations(self, flag):
+        return {self.location(cell) for cell in np.flatnonzero(self.flags & flag).tolist()}
+
+    # Views with the same content as the corresponding attributes of PartiallyObsGridworldParser
+
+    @cached_property
+    def world(self):
+        return self._rows(self.tiles)
+
+    @cached_property
+    def abstract_world(self):
+        return self._rows(self.abstract_tiles) if self.abstract_tiles is not None else None
+
+    @cached_property
+    def stochastic_tile(self):
+        cells = np.flatnonzero(self.rule_index >= 0)
+        return {self.location(cell): self.rule_ids[index]
+                for cell, index in zip(cells.tolist(), self.rule_index[cells].tolist())}
+
+    @cached_property
+    def reward_tiles(self):
+        cells = np.flatnonzero(self.flags & REWARD)
+        return {self.location(cell): reward for cell, reward in zip(cells.tolist(), self.rewards[cells].tolist())}
+
+    @cached_property
+    def goal_locations(self):
+        return self._locations(GOAL)
+
+    @cached_property
+    def terminal_locations(self):
+        return self._locations(TERMINAL)
+
+    @cached_property
+    def behavioral_toggles(self):
+        return self._locations(TOGGLE)
+
+    # Distances to the goals and shortest-path actions, see planning.distance_field and
+    # planning.expected_distance_field. The solver settings of the expected field are read on first access, so they
+    # can be set on the class or on a world before that.
+    expected_distance_tol = 1e-9
+    expected_distance_max_iterations = 100000
+
+    @cached_property
+    def distance_field(self):
+        from gym_partially_observable_grid.planning import distance_field
+        return distance_field(self)
+
+    @cached_property
+    def expected_distance_field(self):
+        from gym_partially_observable_grid.planning import expected_distance_field
+        return expected_distance_field(self, self.expected_distance_tol, self.expected_distance_max_iterations)
+
+    @property
+    def initial_location(self):
+        return self.location(self.initial_cell)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self._ARRAYS:
+            if getattr(self, name) is not None:
+                np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+        meta = {'height': self.height, 'width': self.width, 'state_space': self.state_space,
+                'initial_cell': self.initial_cell, 'rule_ids': self.rule_ids,
+                'abstract_symbol_name_map': self.abstract_symbol_name_map,
+                'rules': {rule_id: list(rule.behaviour.items()) for rule_id, rule in self.rules.items()}}
+        import json
+        with open(os.path.join(directory, 'world.json'), 'w') as file:
+            json.dump(meta, file)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        # With mmap_mode set, arrays are mapped from disk and their pages are shared between processes
+        import json
+        with open(os.path.join(directory, 'world.json')) as file:
+            meta = json.load(file)
+
+        world = cls.__new__(cls)
+        world.height, world.width = meta['height'], meta['width']
+        world.n_cells = world.height * world.width
+        world.state_space = meta['state_space']
+        world.initial_cell = meta['initial_cell']
+        world.rule_ids = meta['rule_ids']
+        world.abstract_symbol_name_map = meta['abstract_symbol_name_map']
+
+        world.rules = dict()
+        for rule_id, behaviour in meta['rules'].items():
+            world.rules[rule_id] = StochasticTile(rule_id)
+            for action, new_action_probabilities in behaviour:
+                world.rules[rule_id].add_stochastic_action(action, [tuple(p) for p in new_action_probabilities])
+
+        for name in cls._ARRAYS:
+            path = os.path.join(directory, f'{name}.npy')
+            setattr(world, name, np.load(path, mmap_mode=mmap_mode) if os.path.exists(path) else None)
+        return world
+
+    def sample_actions(self, cells, actions, uniforms):
+        """
+        Executed actions of agents located in cells that attempt actions, sampled for all agents in one call.
+        Each agent consumes a single uniform draw from [0, 1), so results match StochasticTile.get_action.
+        """
+        rule_index = self.rule_index[cells]
+        if not len(self.rule_ids):
+            return np.asarray(actions).copy()
+        rules = np.maximum(rule_index, 0)
+        outcome = (uniforms[:, None] >= self.slip_cdf[rules, actions]).sum(axis=1)
+        return np.where(rule_index >= 0, self.slip_actions[rules, actions, outcome], actions)
+
+    def _shift(self, x, y):
+        # Cell ids of (x, y) coordinates, -1 for coordinates outside of the grid
+        inside = (x >= 0) & (x < self.height) & (y >= 0) & (y < self.width)
+        return np.where(inside, x * self.width + y, -1)
+
+    def cell(self, location):
+        return location[0] * self.width + location[1]
+
+    def location(self, cell):
+        return divmod(cell, self.width)
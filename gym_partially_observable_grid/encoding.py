@@ -0,0 +1,154 @@
+import os
+from ast import literal_eval
+
+import numpy as np
+
+from gym_partially_observable_grid.utils import actions_dict, action_space_to_act_map
+
+
+class ObservationEncoder:
+    """
+    Arithmetic encoding of observations. Observations are built from a base observation (x-y coordinates or the
+    name of an abstraction), an optional slip of the executed action and an optional wall indication.
+    Ids follow the order in which observations have always been enumerated:
+
+    - base observations:                 base, for base in [0, n_base)
+    - slips (only if the world has rules): n_base + base * 4 + executed_action
+    - wall indication (if indicate_wall):  n_plain + id of the observation above
+
+    The human-readable form, e.g. '(3, 4)_slip_up_wall', is only created by decode.
+    """
+
+    def __init__(self, compiled_world, is_partially_obs=True, indicate_wall=False):
+        self.width = compiled_world.width
+        self.is_partially_obs = is_partially_obs
+        self.has_slips = bool(compiled_world.rule_ids)
+        self.indicate_wall = indicate_wall
+
+        tiles = compiled_world.abstract_tiles if is_partially_obs else compiled_world.tiles
+        symbol_name_index = self._name_index(compiled_world)
+
+        observable = ~np.isin(tiles, [ord('#'), ord('D'), ord('E')])
+        coordinates = observable & np.isin(tiles, [ord(' '), ord('G')]) if is_partially_obs else observable
+        named_cells = np.flatnonzero(observable & ~coordinates & (symbol_name_index[tiles] >= 0))
+        cell_names = symbol_name_index[tiles[named_cells]]
+
+        # Every coordinate cell, and the first cell (in row-major order) of every name, introduces a new base id
+        first_cell = np.full(len(self.names), compiled_world.n_cells, dtype=np.int64)
+        np.minimum.at(first_cell, cell_names, named_cells)
+        introduces = coordinates.copy()
+        introduces[first_cell[first_cell < compiled_world.n_cells]] = True
+        base_cells = np.flatnonzero(introduces)
+
+        # Base id of every cell, -1 for cells without observation
+        self.cell_base = np.full(compiled_world.n_cells, -1, dtype=np.int32)
+        self.cell_base[base_cells] = np.arange(len(base_cells))
+        self.cell_base[named_cells] = self.cell_base[first_cell[cell_names]]
+
+        # Cell of every coordinate base id, -1 - name index for abstract ones
+        self.base_cells = np.where(coordinates[base_cells], base_cells, -1 - symbol_name_index[tiles[base_cells]])
+        self._set_sizes()
+
+    def _name_index(self, compiled_world):
+        # Names of abstract observations and the name index of every abstract symbol
+        self.names = []
+        symbol_name_index = np.full(256, -1, dtype=np.int16)
+        if self.is_partially_obs:
+            for symbol, name in compiled_world.abstract_symbol_name_map.items():
+                if len(symbol) != 1:
+                    continue
+                if name not in self.names:
+                    self.names.append(name)
+                symbol_name_index[ord(symbol)] = self.names.index(name)
+        return symbol_name_index
+
+    def _set_sizes(self):
+        self.name_base = {self.names[-1 - c]: base for base, c in enumerate(self.base_cells.tolist()) if c < 0}
+        self.n_base = len(self.base_cells)
+        self.n_plain = self.n_base * 5 if self.has_slips else self.n_base
+        self.n_observations = self.n_plain * 2 if self.indicate_wall else self.n_plain
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'cell_base.npy'), self.cell_base)
+        np.save(os.path.join(directory, 'base_cells.npy'), self.base_cells)
+        meta = {'width': self.width, 'is_partially_obs': self.is_partially_obs, 'has_slips': self.has_slips,
+                'indicate_wall': self.indicate_wall, 'names': self.names}
+        import json
+        with open(os.path.join(directory, 'encoder.json'), 'w') as file:
+            json.dump(meta, file)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        import json
+        with open(os.path.join(directory, 'encoder.json')) as file:
+            meta = json.load(file)
+        encoder = cls.__new__(cls)
+        for name, value in meta.items():
+            setattr(encoder, name, value)
+        encoder.cell_base = np.load(os.path.join(directory, 'cell_base.npy'), mmap_mode=mmap_mode)
+        encoder.base_cells = np.load(os.path.join(directory, 'base_cells.npy'), mmap_mode=mmap_mode)
+        encoder._set_sizes()
+        return encoder
+
+    def encode(self, cell, slip=None, wall=False):
+        observation = int(self.cell_base[cell])
+        if slip is not None:
+            observation = self.n_base + observation * 4 + slip
+        if wall:
+            observation += self.n_plain
+        return observation
+
+    def encode_batch(self, cells, slips=None, walls=None):
+        # Vectorized encode; slips holds the executed action or -1 where no slip is observed
+        observations = self.cell_base[cells].astype(np.int64)
+        if slips is not None:
+            observations = np.where(slips >= 0, self.n_base + observations * 4 + slips, observations)
+        if walls is not None and self.indicate_wall:
+            observations += walls * self.n_plain
+        return observations
+
+    def decode(self, observation):
+        if not 0 <= observation < self.n_observations:
+            raise KeyError(observation)
+        wall = observation >= self.n_plain
+        if wall:
+            observation -= self.n_plain
+        slip = None
+        if observation >= self.n_base:
+            observation, slip = divmod(observation - self.n_base, 4)
+
+        base_cell = int(self.base_cells[observation])
+        decoded = divmod(base_cell, self.width) if base_cell >= 0 else self.names[-1 - base_cell]
+        if slip is not None:
+            decoded = f'{decoded}_slip_{action_space_to_act_map[slip]}'
+        if wall:
+            decoded = f'{decoded}_wall'
+        return decoded
+
+    def encode_observation(self, observation):
+        # Inverse of decode, that is, encodes observations in their human-readable form
+        slip, wall = None, False
+        if isinstance(observation, str):
+            if self.indicate_wall and observation.endswith('_wall'):
+                observation, wall = observation[:-len('_wall')], True
+            if self.has_slips and '_slip_' in observation:
+                observation, slip_action = observation.rsplit('_slip_', 1)
+                slip = actions_dict[slip_action]
+            if observation not in self.name_base and observation.startswith('('):
+                observation = literal_eval(observation)
+
+        if isinstance(observation, tuple):
+            cell = observation[0] * self.width + observation[1]
+            base = int(self.cell_base[cell])
+            if base < 0 or self.base_cells[base] != cell:
+                raise KeyError(observation)
+        else:
+            base = self.name_base[observation]
+
+        if slip is not None:
+            base = self.n_base + base * 4 + slip
+        return base + self.n_plain if wall else base
+
+    def state_2_one_hot_map(self):
+        return {self.decode(observation): observation for observation in range(self.n_observations)}
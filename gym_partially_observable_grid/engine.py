@@ -0,0 +1,452 @@
+from collections import namedtuple
+from functools import cached_property
+
+import numpy as np
+
+from gym_partially_observable_grid.compiled import TOGGLE, REWARD, GOAL, TERMINAL
+from gym_partially_observable_grid.layout import WorldLayout, load_layout
+from gym_partially_observable_grid.rng import UNIFORM_BLOCK_SIZE, seed_sequence, generator, freeze_state, thaw_state
+from gym_partially_observable_grid.utils import actions_dict, action_space_to_act_map
+
+
+# Dynamic state of GridEngine, see clone_state. Cells are ids x * width + y, collected rewards are
+# locations as in collected_rewards, slip_action is the name of the slipped action or None, and rng_state is the
+# generator state at the start of the current block of uniform draws and the position in that block.
+EnvState = namedtuple('EnvState', ['player_cell', 'step_counter', 'use_stochastic_tiles', 'collected_rewards',
+                                   'slip_action', 'rng_state'], defaults=(None,))
+
+
+def _scalar_view(array):
+    # Memoryviews give fast scalar indexing of NumPy arrays; virtual arrays of tiled worlds are indexed directly
+    return memoryview(array) if isinstance(array, np.ndarray) else array
+
+
+class GridEngine:
+    """
+    Simulator of a partially observable gridworld: loads the compiled world (see load_layout), steps episodes and
+    encodes observations. It only depends on NumPy; PartiallyObservableWorld adds the gym interface on top.
+    """
+
+    metadata = {'render_modes': ['human', 'ansi', 'rgb_array']}
+
+    # Available actions, shared by all environments
+    actions_dict = actions_dict
+    action_space_to_act_map = action_space_to_act_map
+    actions = [0, 1, 2, 3]
+
+    def __init__(self,
+                 world_file_path,
+                 force_determinism=False,
+                 indicate_slip=False,
+                 is_partially_obs=True,
+                 indicate_wall=False,
+                 max_ep_len=100,
+                 goal_reward=100,
+                 one_time_rewards=True,
+                 step_penalty=0,
+                 cache_dir=None,
+                 repeat=None,
+                 seed=None):
+
+        # Static layout: array-backed world and observation encoder, shared by all environments made from the same
+        # file and options (see load_layout). If cache_dir is set, they are loaded from (and stored to) the compiled
+        # world cache instead of parsing the world file. A WorldLayout can be passed instead of a path, in which
+        # case its options replace is_partially_obs, indicate_wall and repeat.
+        if isinstance(world_file_path, WorldLayout):
+            self.layout = world_file_path
+            is_partially_obs, indicate_wall = self.layout.is_partially_obs, self.layout.indicate_wall
+        else:
+            self.layout = load_layout(world_file_path, is_partially_obs, indicate_wall, cache_dir, repeat)
+        self.compiled_world, self.encoder = self.layout.compiled_world, self.layout.encoder
+
+        # State space size from layout file
+        self.state_space = self.compiled_world.state_space
+        # Map of abstract symbols to their names (if any)
+        self.abstract_symbol_name_map = self.compiled_world.abstract_symbol_name_map
+        # Map of stochastic tiles, where each tile is identified by rule_id
+        self.rules = self.compiled_world.rules
+        # force_determinism - this option exist if you want to make a stochastic env. deterministic
+        self.force_determinism = force_determinism
+        # If one_time_rewards set to True, reward for that tile will be receive only once during the episode
+        self.one_time_rewards = one_time_rewards
+        self.collected_rewards = set()
+
+        # If true, once the executed action is not the same as the desired action,
+        # 'slip' will be added to abstract output
+        self.indicate_slip = indicate_slip
+        self.slip_action = None
+
+        # If indicate_wall is set to True, suffix '_wall' will be added once the agent runs into the wall
+        self.indicate_wall = indicate_wall
+
+        # Indicate whether observations will be abstracted or will they be x-y coordinates
+        self.is_partially_obs = is_partially_obs
+
+        # If abstraction is not defined, environment cannot be partially observable
+        if self.compiled_world.abstract_tiles is None:
+            self.is_partially_obs = False
+
+        # Layout variables
+        self.initial_location = self.compiled_world.initial_location
+
+        # Should stochastic behaviour be enabled
+        self.use_stochastic_tiles = True
+
+        # Reward reached when reaching goal or negative amount when terminal state will be reached
+        self.goal_reward = goal_reward
+
+        # Step penalty that will be returned every every step if the reward is not reached
+        self.step_penalty = step_penalty if step_penalty < 0 else step_penalty * -1
+
+        # Episode length
+        self.max_ep_len = max_ep_len
+        self.step_counter = 0
+
+        self._width = self.compiled_world.width
+        self._cell_deltas = self.compiled_world.cell_deltas
+        self._rules = [self.rules[rule_id] for rule_id in self.compiled_world.rule_ids]
+        self._bind_views()
+
+        self._player_cell = self.compiled_world.initial_cell
+
+        # Observations are encoded arithmetically, see ObservationEncoder
+        self._n_base, self._n_plain = self.encoder.n_base, self.encoder.n_plain
+
+        # Stochastic tiles are sampled with uniforms drawn in blocks from the generator of the environment
+        self.seed(seed)
+
+        # Created on first render
+        self._renderer = None
+        # Optional callable observing every step (see step), e.g. by InstrumentedWorld; not pickled
+        self.step_hook = None
+        # Slips are only observable under abstraction
+        self._indicate_slip = self.is_partially_obs and self.indicate_slip
+
+    # Views of the compiled world and encoder used in step; they cannot be pickled and are bound again on unpickling
+    _VIEWS = ('_next_cell', '_flags', '_rewards', '_rule_index', '_cell_base')
+    # Attributes that are not pickled but taken from the layout again or rebuilt on access
+    _DERIVED = _VIEWS + ('compiled_world', 'encoder', 'state_2_one_hot_map', 'one_hot_2_state_map')
+
+    def _bind_views(self):
+        # Memoryviews of the compiled world give fast scalar indexing without numpy overhead
+        self._next_cell = _scalar_view(self.compiled_world.next_cell.reshape(-1))
+        self._flags = _scalar_view(self.compiled_world.flags)
+        self._rewards = _scalar_view(self.compiled_world.rewards)
+        self._rule_index = _scalar_view(self.compiled_world.rule_index)
+        self._cell_base = _scalar_view(self.encoder.cell_base)
+
+    def __getstate__(self):
+        # The layout is pickled once (shared layouts only by name), the world and encoder are taken from it again
+        state = {k: v for k, v in self.__dict__.items() if k not in self._DERIVED}
+        state['_renderer'] = None
+        state['step_hook'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compiled_world, self.encoder = self.layout.compiled_world, self.layout.encoder
+        self._bind_views()
+
+    # Representation of concrete ((x,y) coordinates) world and abstract world
+    @property
+    def world(self):
+        return self.compiled_world.world
+
+    @property
+    def abstract_world(self):
+        return self.compiled_world.abstract_world
+
+    # Map of locations to rule_ids, that is, tile has stochastic behaviour
+    @property
+    def stochastic_tile(self):
+        return self.compiled_world.stochastic_tile if not self.force_determinism else dict()
+
+    # Map of locations that return a reward
+    @property
+    def reward_tiles(self):
+        return self.compiled_world.reward_tiles
+
+    @property
+    def goal_locations(self):
+        return self.compiled_world.goal_locations
+
+    @property
+    def terminal_locations(self):
+        return self.compiled_world.terminal_locations
+
+    @property
+    def behavioral_toggles(self):
+        return self.compiled_world.behavioral_toggles
+
+    # Both maps are built on first access and kept
+    @cached_property
+    def state_2_one_hot_map(self):
+        return self.encoder.state_2_one_hot_map()
+
+    @cached_property
+    def one_hot_2_state_map(self):
+        return {v: k for k, v in self.state_2_one_hot_map.items()}
+
+    @property
+    def player_location(self):
+        return divmod(self._player_cell, self._width)
+
+    @player_location.setter
+    def player_location(self, location):
+        self._player_cell = location[0] * self._width + location[1]
+
+    def step(self, action):
+        """
+        If step_hook is set, it is called before returning with the transition of the step: the cell before the
+        step, the executed action, whether that action was sampled on a stochastic tile, the cell after the step
+        (-1 if a wall was hit), whether a door was traversed and the flags of the new cell (0 if a wall was hit).
+        """
+        assert action in self.actions
+
+        self.step_counter += 1
+        cell = self._player_cell
+
+        # Stochastic tiles might change the executed action
+        self.slip_action = None
+        slip = False
+        sampled = False
+        rule_index = self._rule_index[cell]
+        if rule_index >= 0 and not self.force_determinism and self.use_stochastic_tiles:
+            sampled = True
+            if self._uniform_index == UNIFORM_BLOCK_SIZE:
+                self._draw_uniforms()
+            new_action = self._rules[rule_index].sample_action(action, self._uniforms[self._uniform_index])
+            self._uniform_index += 1
+            if new_action != action:
+                action = new_action
+                self.slip_action = self.action_space_to_act_map[action]
+                slip = self._indicate_slip
+
+        new_cell = self._next_cell[cell * 4 + action]
+        if new_cell < 0:
+            observation = self._cell_base[cell]
+            if slip:
+                observation = self._n_base + observation * 4 + action
+            if self.indicate_wall:
+                observation += self._n_plain
+            done = True if self.step_counter >= self.max_ep_len else False
+            if self.step_hook is not None:
+                self.step_hook(cell, action, sampled, -1, False, 0)
+            return observation, self.step_penalty, done, {}
+
+        # If you open the door, the step is performed once more (deterministically) and the slip is forgotten
+        door = new_cell != cell + self._cell_deltas[action]
+        if door:
+            self.slip_action = None
+            slip = False
+
+        # Update player location
+        self._player_cell = new_cell
+        flags = self._flags[new_cell]
+
+        # Account for behavioural toggle (disable/enable stochastic behaviour)
+        if flags & TOGGLE:
+            self.use_stochastic_tiles = not self.use_stochastic_tiles
+
+        # Reward is reached if goal is reached. This terminates the episode.
+        reward = 0
+        if flags & REWARD:
+            location = divmod(new_cell, self._width)
+            if not self.one_time_rewards or location not in self.collected_rewards:
+                reward = self._rewards[new_cell]
+            self.collected_rewards.add(location)
+
+        done = False
+
+        if flags & GOAL:
+            reward = self.goal_reward
+            done = True
+        if flags & TERMINAL:
+            reward = self.goal_reward * -1
+            done = True
+
+        if self.step_counter >= self.max_ep_len:
+            done = True
+
+        if self.step_penalty != 0 and reward == 0:
+            reward = self.step_penalty
+
+        observation = self._cell_base[new_cell]
+        if slip:
+            observation = self._n_base + observation * 4 + action
+        if self.step_hook is not None:
+            self.step_hook(cell, action, sampled, new_cell, door, flags)
+        return observation, reward, done, {}
+
+    def seed(self, seed=None):
+        """
+        Seeds the generator of the environment with None (fresh entropy), an integer or a SeedSequence, e.g. one of
+        rng.lane_seeds, to reproduce a lane of a batched environment.
+        """
+        self._seed_sequence = seed_sequence(seed)
+        self._np_random = generator(self._seed_sequence)
+        self._draw_uniforms()
+        return [self._seed_sequence.entropy]
+
+    def spawn(self, n):
+        # Independent child seeds, e.g. for environments of worker processes
+        return self._seed_sequence.spawn(n)
+
+    def _draw_uniforms(self):
+        self._block_state = freeze_state(self._np_random.bit_generator.state)
+        self._uniforms = self._np_random.random(UNIFORM_BLOCK_SIZE).tolist()
+        self._uniform_index = 0
+
+    def clone_state(self, include_rng=True):
+        """
+        Immutable (and hashable) snapshot of the dynamic state of the environment. The static layout is shared,
+        so snapshots are cheap to take and restore_state restores them in constant time. With include_rng, the
+        position in the random stream that samples stochastic tiles is captured as well.
+        """
+        return EnvState(self._player_cell, self.step_counter, self.use_stochastic_tiles,
+                        frozenset(self.collected_rewards), self.slip_action,
+                        (self._block_state, self._uniform_index) if include_rng else None)
+
+    def restore_state(self, state):
+        self._player_cell = state.player_cell
+        self.step_counter = state.step_counter
+        self.use_stochastic_tiles = state.use_stochastic_tiles
+        self.collected_rewards = set(state.collected_rewards)
+        self.slip_action = state.slip_action
+        if state.rng_state is not None:
+            block_state, uniform_index = state.rng_state
+            # Draw the block again, unless the snapshot was taken within the current one
+            if block_state != self._block_state:
+                self._np_random.bit_generator.state = thaw_state(block_state)
+                self._draw_uniforms()
+            self._uniform_index = uniform_index
+
+    def simulate(self, state, action, rng=None):
+        """
+        Pure version of step: returns (next state, observation, reward, done) of executing action in state, without
+        changing the environment. Stochastic tiles are sampled with rng (any object with a random() method, e.g.
+        random.Random or numpy.random.Generator), or the random module if it is None.
+        Returned states do not carry an RNG state.
+        """
+        cell, step_counter, use_stochastic_tiles, collected_rewards = state[:4]
+        step_counter += 1
+
+        slip_action = None
+        slip = False
+        rule_index = self._rule_index[cell]
+        if rule_index >= 0 and not self.force_determinism and use_stochastic_tiles:
+            new_action = self._rules[rule_index].get_action(action, rng)
+            if new_action != action:
+                action = new_action
+                slip_action = self.action_space_to_act_map[action]
+                slip = self._indicate_slip
+
+        done = step_counter >= self.max_ep_len
+        new_cell = self._next_cell[cell * 4 + action]
+        if new_cell < 0:
+            observation = self._cell_base[cell]
+            if slip:
+                observation = self._n_base + observation * 4 + action
+            if self.indicate_wall:
+                observation += self._n_plain
+            return EnvState(cell, step_counter, use_stochastic_tiles, collected_rewards, slip_action), \
+                observation, self.step_penalty, done
+
+        # Doors are passed through deterministically and the slip is forgotten
+        if new_cell != cell + self._cell_deltas[action]:
+            slip_action = None
+            slip = False
+
+        flags = self._flags[new_cell]
+        if flags & TOGGLE:
+            use_stochastic_tiles = not use_stochastic_tiles
+
+        reward = 0
+        if flags & REWARD:
+            location = divmod(new_cell, self._width)
+            if location not in collected_rewards:
+                reward = self._rewards[new_cell]
+                collected_rewards = collected_rewards | {location}
+            elif not self.one_time_rewards:
+                reward = self._rewards[new_cell]
+
+        if flags & GOAL:
+            reward = self.goal_reward
+            done = True
+        if flags & TERMINAL:
+            reward = self.goal_reward * -1
+            done = True
+
+        if self.step_penalty != 0 and reward == 0:
+            reward = self.step_penalty
+
+        observation = self._cell_base[new_cell]
+        if slip:
+            observation = self._n_base + observation * 4 + action
+        return EnvState(new_cell, step_counter, use_stochastic_tiles, collected_rewards, slip_action), \
+            observation, reward, done
+
+    def get_observation(self):
+        if self.is_partially_obs:
+            if self.indicate_slip and self.slip_action is not None:
+                observation = f'{self.get_abstraction()}_slip_{self.slip_action}'
+            else:
+                observation = self.get_abstraction()
+        else:
+            observation = self.player_location
+        return observation
+
+    def move(self, action):
+        if action == 0:  # up
+            return self.player_location[0] - 1, self.player_location[1]
+        if action == 1:  # down
+            return self.player_location[0] + 1, self.player_location[1]
+        if action == 2:  # left
+            return self.player_location[0], self.player_location[1] - 1
+        if action == 3:  # right
+            return self.player_location[0], self.player_location[1] + 1
+
+    def encode(self, state):
+        return self.encoder.encode_observation(state)
+
+    def decode(self, one_hot_enc):
+        return self.encoder.decode(one_hot_enc)
+
+    def get_abstraction(self):
+        abstract_tile = chr(self.compiled_world.abstract_tiles[self._player_cell])
+        # Goal tiles of the abstraction are observed by their coordinates, as in ObservationEncoder
+        if abstract_tile not in {' ', 'G'}:
+            return self.abstract_symbol_name_map[abstract_tile]
+        else:
+            return self.player_location
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        self.step_counter = 0
+        self.slip_action = None
+        self.use_stochastic_tiles = True
+        self._player_cell = self.compiled_world.initial_cell
+        self.collected_rewards.clear()
+        return self._cell_base[self._player_cell]
+
+    def render(self, mode='human', viewport=None, shared_frame=False):
+        # Modes are 'human' (printed), 'ansi' (string) and 'rgb_array'; a viewport of (rows, columns) renders only
+        # the part of the world around the agent. See Renderer for shared_frame.
+        if self._renderer is None:
+            from gym_partially_observable_grid.rendering import Renderer
+            self._renderer = Renderer(self.compiled_world)
+        if mode == 'human':
+            print(self._renderer.ansi(self._player_cell, viewport))
+            return None
+        return self._renderer.render(self._player_cell, mode, viewport, shared_frame)
+
+    def play(self):
+        self.reset()
+        user_input_map = {'w': 0, 's': 1, 'a': 2, 'd': 3}
+        print('Agent is controlled with w,a,s,d; for up,left,down,right actions.')
+        while True:
+            self.render()
+            action = input('Action: ', )
+            output, reward, done, info = self.step(user_input_map[action])
+            print(f'Output: {self.decode(output), reward, done, info}')
@@ -0,0 +1,170 @@
+import multiprocessing as mp
+
+import gym
+import numpy as np
+from gym import spaces
+
+from gym_partially_observable_grid.envs.PartiallyObsGridEnv import PartiallyObservableWorld
+from gym_partially_observable_grid.layout import WorldLayout, load_layout
+from gym_partially_observable_grid.rng import lane_seeds
+
+# Commands sent to workers; actions and results are exchanged through shared memory
+_STEP, _RESET, _SEED, _CLOSE = 0, 1, 2, 3
+
+
+def _shared_array(ctx, dtype, size):
+    dtype = np.dtype(dtype)
+    raw = ctx.RawArray('b', size * dtype.itemsize)
+    return raw, np.frombuffer(raw, dtype=dtype)
+
+
+def _worker(remote, parent_remote, layout, env_kwargs, lanes, raw_buffers, seeds):
+    parent_remote.close()
+
+    actions, observations, rewards, dones, final_observations = [
+        np.frombuffer(raw, dtype=dtype) for raw, dtype in zip(raw_buffers, _BUFFER_DTYPES)]
+    # Every lane has its own stream, so results do not depend on how lanes are split over workers. All lanes map the
+    # same shared layout.
+    envs = [PartiallyObservableWorld(layout, seed=seed, **env_kwargs) for seed in seeds]
+    try:
+        while True:
+            command, seeds = remote.recv()
+            if command == _STEP:
+                for i, env in zip(lanes, envs):
+                    observation, reward, done, _ = env.step(int(actions[i]))
+                    if done:
+                        final_observations[i] = observation
+                        observation = env.reset()
+                    observations[i], rewards[i], dones[i] = observation, reward, done
+            elif command == _RESET:
+                for i, env in zip(lanes, envs):
+                    observations[i] = env.reset()
+            elif command == _SEED:
+                for env, seed in zip(envs, seeds):
+                    env.seed(seed)
+            elif command == _CLOSE:
+                break
+            remote.send(None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+# Types of actions, observations, rewards, dones and final observations
+_BUFFER_DTYPES = (np.int64, np.int64, np.float64, np.bool_, np.int64)
+
+
+class SubprocPartiallyObservableWorld(gym.Env):
+    """
+    Batch of num_envs PartiallyObservableWorld instances spread over num_workers processes.
+    Actions and results are exchanged through shared-memory NumPy buffers, only a short command per worker goes
+    through a pipe. The world is compiled once in the parent and its layout is shared with the workers through
+    shared memory. Semantics (auto-reset, 'final_observation', per-lane random streams) are the same as in
+    VectorPartiallyObservableWorld, so both produce identical results for the same seed.
+    """
+
+    def __init__(self, world_file_path, num_envs=8, num_workers=None, start_method=None, seed=None, **env_kwargs):
+        self.num_envs = num_envs
+        num_workers = min(num_workers or mp.cpu_count(), num_envs)
+        ctx = mp.get_context(start_method)
+
+        if not isinstance(world_file_path, WorldLayout):
+            world_file_path = load_layout(world_file_path, *[env_kwargs.pop(option, default) for option, default in (
+                ('is_partially_obs', True), ('indicate_wall', False), ('cache_dir', None), ('repeat', None))])
+        # Layouts shared here are owned by this environment and removed on close
+        self._layout = world_file_path.share()
+        self._owns_layout = self._layout is not world_file_path
+
+        raw_buffers, buffers = zip(*[_shared_array(ctx, dtype, num_envs) for dtype in _BUFFER_DTYPES])
+        self._actions, self._observations, self._rewards, self._dones, self._final_observations = buffers
+
+        seeds = lane_seeds(seed, num_envs)
+        self._worker_lanes = [lanes.tolist() for lanes in np.array_split(np.arange(num_envs), num_workers)]
+        self._remotes, self._processes = [], []
+        for lanes in self._worker_lanes:
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(target=_worker,
+                                  args=(worker_remote, remote, self._layout, env_kwargs, lanes, raw_buffers,
+                                        [seeds[lane] for lane in lanes]),
+                                  daemon=True)
+            process.start()
+            worker_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(process)
+
+        env = PartiallyObservableWorld(self._layout, **env_kwargs)
+        self._decode = env.decode
+        self.action_space = spaces.MultiDiscrete([4] * num_envs)
+        self.observation_space = spaces.MultiDiscrete([env.observation_space.n] * num_envs)
+
+        self._waiting = False
+        self.closed = False
+
+    def _send(self, command, seeds=None):
+        for remote, lanes in zip(self._remotes, self._worker_lanes):
+            remote.send((command, [seeds[lane] for lane in lanes] if seeds is not None else None))
+
+    def _wait(self):
+        for remote in self._remotes:
+            remote.recv()
+
+    def step_async(self, actions):
+        assert not self._waiting
+        self._actions[:] = actions
+        self._send(_STEP)
+        self._waiting = True
+
+    def step_wait(self):
+        self._wait()
+        self._waiting = False
+        dones = self._dones.copy()
+        info = {}
+        if dones.any():
+            info['final_observation'] = np.where(dones, self._final_observations, self._observations)
+        return self._observations.copy(), self._rewards.copy(), dones, info
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def seed(self, seed=None):
+        if self._waiting:
+            self._wait()
+            self._waiting = False
+        self._send(_SEED, lane_seeds(seed, self.num_envs))
+        self._wait()
+        return [seed]
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        if self._waiting:
+            self._wait()
+            self._waiting = False
+        self._send(_RESET)
+        self._wait()
+        return self._observations.copy()
+
+    def decode(self, one_hot_enc):
+        return self._decode(one_hot_enc)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._waiting:
+                self._wait()
+            self._send(_CLOSE)
+        except (BrokenPipeError, EOFError, ConnectionResetError):
+            # Workers already exited
+            pass
+        for process in self._processes:
+            process.join()
+        if self._owns_layout:
+            self._layout.unlink()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
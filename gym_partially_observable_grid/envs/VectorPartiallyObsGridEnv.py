@@ -0,0 +1,151 @@
+import gym
+import numpy as np
+from gym import spaces
+
+from gym_partially_observable_grid.compiled import TOGGLE, REWARD, GOAL, TERMINAL
+from gym_partially_observable_grid.layout import WorldLayout, load_layout
+from gym_partially_observable_grid.rng import UniformBlocks, lane_seeds
+
+
+class VectorPartiallyObservableWorld(gym.Env):
+    """
+    Batch of num_envs independent episodes in the same world, stepped together with NumPy.
+    Takes the same options as PartiallyObservableWorld. Finished episodes are reset automatically; the observation
+    that ended them can be found under 'final_observation' in the info dictionary.
+    Every lane samples stochastic tiles from its own generator; lane i of a batch seeded with seed reproduces a
+    PartiallyObservableWorld seeded with rng.lane_seeds(seed, num_envs)[i] bit for bit.
+    """
+
+    def __init__(self,
+                 world_file_path,
+                 num_envs=8,
+                 force_determinism=False,
+                 indicate_slip=False,
+                 is_partially_obs=True,
+                 indicate_wall=False,
+                 max_ep_len=100,
+                 goal_reward=100,
+                 one_time_rewards=True,
+                 step_penalty=0,
+                 cache_dir=None,
+                 seed=None):
+
+        if isinstance(world_file_path, WorldLayout):
+            self.layout = world_file_path
+            indicate_wall = self.layout.indicate_wall
+        else:
+            self.layout = load_layout(world_file_path, is_partially_obs, indicate_wall, cache_dir)
+        self.compiled_world, self.encoder = self.layout.compiled_world, self.layout.encoder
+
+        self.num_envs = num_envs
+        self.force_determinism = force_determinism
+        self.indicate_wall = indicate_wall
+        self.is_partially_obs = self.encoder.is_partially_obs
+        # Slips are only observable under abstraction
+        self.indicate_slip = indicate_slip and self.is_partially_obs
+        self.max_ep_len = max_ep_len
+        self.goal_reward = goal_reward
+        self.one_time_rewards = one_time_rewards
+        self.step_penalty = step_penalty if step_penalty < 0 else step_penalty * -1
+
+        # Index of every reward tile in the collected rewards mask, -1 for other cells
+        reward_cells = np.flatnonzero(self.compiled_world.flags & REWARD)
+        self.reward_index = np.full(self.compiled_world.n_cells, -1, dtype=np.int64)
+        self.reward_index[reward_cells] = np.arange(len(reward_cells))
+
+        self._cell_deltas = np.array(self.compiled_world.cell_deltas, dtype=np.int64)
+        self._lanes = np.arange(num_envs)
+
+        # Dynamic state of every environment
+        self.player_cells = np.full(num_envs, self.compiled_world.initial_cell, dtype=np.int64)
+        self.step_counters = np.zeros(num_envs, dtype=np.int64)
+        self.use_stochastic_tiles = np.ones(num_envs, dtype=bool)
+        self.collected_rewards = np.zeros((num_envs, len(reward_cells)), dtype=bool)
+        # Executed action if it differs from the desired one, -1 otherwise
+        self.slip_actions = np.full(num_envs, -1, dtype=np.int64)
+
+        self.action_space = spaces.MultiDiscrete([4] * num_envs)
+        self.observation_space = spaces.MultiDiscrete([self.encoder.n_observations] * num_envs)
+
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self._uniforms = UniformBlocks(lane_seeds(seed, self.num_envs))
+        return [seed]
+
+    @property
+    def player_locations(self):
+        return np.stack(np.divmod(self.player_cells, self.compiled_world.width), axis=1)
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        assert actions.shape == (self.num_envs,) and ((actions >= 0) & (actions < 4)).all()
+
+        world = self.compiled_world
+        self.step_counters += 1
+        cells = self.player_cells
+
+        executed = actions
+        if not self.force_determinism and world.rule_ids:
+            # Only lanes on active stochastic tiles consume a uniform draw
+            active = np.flatnonzero((world.rule_index[cells] >= 0) & self.use_stochastic_tiles)
+            if len(active):
+                executed = actions.copy()
+                executed[active] = world.sample_actions(cells[active], actions[active], self._uniforms.take(active))
+
+        new_cells = world.next_cell[cells, executed]
+        walls = new_cells < 0
+        moved = ~walls
+        new_cells = np.where(walls, cells, new_cells)
+
+        # Passing through a door is a second, deterministic move that forgets the slip
+        through_door = moved & (new_cells != cells + self._cell_deltas[executed])
+        self.slip_actions = np.where((executed != actions) & ~through_door, executed, -1)
+
+        flags = np.where(moved, world.flags[new_cells], 0)
+        self.use_stochastic_tiles ^= (flags & TOGGLE) != 0
+
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        reward_hits = np.flatnonzero(flags & REWARD)
+        if len(reward_hits):
+            reward_index = self.reward_index[new_cells[reward_hits]]
+            paid = reward_hits
+            if self.one_time_rewards:
+                paid = reward_hits[~self.collected_rewards[reward_hits, reward_index]]
+            rewards[paid] = world.rewards[new_cells[paid]]
+            self.collected_rewards[reward_hits, reward_index] = True
+
+        goals, terminals = (flags & GOAL) != 0, (flags & TERMINAL) != 0
+        rewards[goals] = self.goal_reward
+        rewards[terminals] = self.goal_reward * -1
+        dones = goals | terminals | (self.step_counters >= self.max_ep_len)
+
+        if self.step_penalty != 0:
+            rewards[rewards == 0] = self.step_penalty
+
+        self.player_cells = new_cells
+        slips = self.slip_actions if self.indicate_slip else None
+        observations = self.encoder.encode_batch(new_cells, slips, walls)
+
+        info = {}
+        if dones.any():
+            info['final_observation'] = observations.copy()
+            observations[dones] = self._reset_lanes(dones)
+
+        return observations, rewards, dones, info
+
+    def _reset_lanes(self, lanes):
+        self.player_cells[lanes] = self.compiled_world.initial_cell
+        self.step_counters[lanes] = 0
+        self.use_stochastic_tiles[lanes] = True
+        self.collected_rewards[lanes] = False
+        self.slip_actions[lanes] = -1
+        return self.encoder.cell_base[self.compiled_world.initial_cell]
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        return np.full(self.num_envs, self._reset_lanes(self._lanes), dtype=np.int64)
+
+    def decode(self, one_hot_enc):
+        return self.encoder.decode(one_hot_enc)
@@ -1 +1,6 @@
-from gym_partially_observable_grid.envs.PartiallyObsGridEnv import PartiallyObservableWorld
\ No newline at end of file
+from gym_partially_observable_grid import register_envs
+from gym_partially_observable_grid.envs.PartiallyObsGridEnv import PartiallyObservableWorld, EnvState
+from gym_partially_observable_grid.envs.VectorPartiallyObsGridEnv import VectorPartiallyObservableWorld
+from gym_partially_observable_grid.envs.SubprocPartiallyObsGridEnv import SubprocPartiallyObservableWorld
+
+register_envs()
@@ -0,0 +1,177 @@
+import json
+import re
+
+import numpy as np
+
+from gym_partially_observable_grid.compiled import GOAL, TERMINAL
+from gym_partially_observable_grid.planning import TransitionModel, _SparseModel
+from gym_partially_observable_grid.utils import action_space_to_act_map
+
+ACTION_NAMES = [action_space_to_act_map[action] for action in range(4)]
+
+# Number of (state, action) rows or entries written at once by the streaming exporters
+_CHUNK_SIZE = 1 << 16
+
+
+def _model(world, **kwargs):
+    # Models are exported as they are; parsed and compiled worlds are exported through their TransitionModel
+    return world if isinstance(world, _SparseModel) else TransitionModel(world, **kwargs)
+
+
+def sparse_table(model):
+    """
+    Transitions of a sparse model as (source, action, target, probability, reward) arrays sorted by source, action
+    and target. Entries with the same source, action and target are merged; their reward is the probability-weighted
+    mean of the merged rewards.
+    """
+    n_states = model.n_states
+    actions, sources = np.divmod(np.repeat(np.arange(4 * n_states), np.diff(model.indptr)), n_states)
+    keys = (sources * 4 + actions) * n_states + model.next_state
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    probability = np.bincount(inverse, model.prob, len(unique_keys))
+    reward = np.bincount(inverse, model.prob * model.reward, len(unique_keys)) / probability
+    rows, target = np.divmod(unique_keys, n_states)
+    source, action = np.divmod(rows, 4)
+    return source, action, target, probability, reward
+
+
+def state_outputs(model, is_partially_obs=True):
+    # Output of every state: the name of its abstraction, or its (x, y) coordinates if it has none
+    world = model.compiled_world
+    cells = model.state_cells
+    outputs = [world.location(cell) for cell in cells.tolist()]
+    if is_partially_obs and world.abstract_tiles is not None:
+        symbols = np.asarray(world.abstract_tiles[cells])
+        for symbol, name in world.abstract_symbol_name_map.items():
+            if len(symbol) == 1:
+                for state in np.flatnonzero(symbols == ord(symbol)).tolist():
+                    outputs[state] = name
+    return outputs
+
+
+def to_mdp(world, is_partially_obs=True, force_determinism=False):
+    """
+    aalpy Mdp of a world (parser, compiled world or sparse model). States are named s0, s1, ... in row-major order of
+    their cells and output their abstraction name or coordinates. As in TransitionModel, goal and terminal states are
+    absorbing: every action keeps the agent there. Requires aalpy.
+    """
+    from aalpy.automata import Mdp, MdpState
+
+    model = _model(world, force_determinism=force_determinism)
+    states = [MdpState(f's{state}', output) for state, output in enumerate(state_outputs(model, is_partially_obs))]
+    source, action, target, probability, _ = sparse_table(model)
+    for s, a, t, p in zip(source.tolist(), action.tolist(), target.tolist(), probability.tolist()):
+        states[s].transitions[ACTION_NAMES[a]].append((states[t], p))
+    return Mdp(states[model.initial_state], states)
+
+
+def label_name(name, used):
+    # PRISM identifier of an abstraction name: prefixed with abs_, other characters than letters, digits and
+    # underscores replaced, and a numeric suffix if the result is already in used
+    base = 'abs_' + re.sub(r'[^A-Za-z0-9_]', '_', name)
+    label, suffix = base, 1
+    while label in used:
+        suffix += 1
+        label = f'{base}_{suffix}'
+    return label
+
+
+def _labels(model, is_partially_obs):
+    # PRISM labels: goal and terminal states, and the states of every abstraction name
+    flags = np.asarray(model.compiled_world.flags[model.state_cells])
+    labels = {'goal': np.flatnonzero(flags & GOAL), 'terminal': np.flatnonzero(flags & TERMINAL)}
+    names = dict()
+    for state, output in enumerate(state_outputs(model, is_partially_obs)):
+        if isinstance(output, str):
+            names.setdefault(output, []).append(state)
+    for name, states in names.items():
+        labels[label_name(name, labels)] = np.array(states)
+    return labels
+
+
+def export_prism(world, path, is_partially_obs=True, **kwargs):
+    """
+    Writes a world (parser, compiled world or sparse model) as a PRISM MDP with a single state variable s, labels
+    "goal", "terminal" and one per abstraction name (see label_name), and a "reward" structure holding the expected
+    reward of every state and action. Further keyword arguments are passed to TransitionModel.
+    """
+    model = _model(world, **kwargs)
+    source, action, target, probability, reward = sparse_table(model)
+    rows = source * 4 + action
+    # First entry of every (state, action) row
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    bounds = np.append(starts, len(rows))
+
+    with open(path, 'w') as file:
+        file.write(f'mdp\n\nmodule grid\n\n    s : [0..{model.n_states - 1}] init {model.initial_state};\n\n')
+        for first in range(0, len(starts), _CHUNK_SIZE):
+            last = min(first + _CHUNK_SIZE, len(starts))
+            begin, end = bounds[first], bounds[last]
+            updates = [f"{p!r}:(s'={t})" for p, t in zip(probability[begin:end].tolist(), target[begin:end].tolist())]
+            row_bounds = (bounds[first:last + 1] - begin).tolist()
+            row_starts = starts[first:last]
+            file.write(''.join(
+                f'    [{ACTION_NAMES[a]}] s={s} -> {" + ".join(updates[row_bounds[i]:row_bounds[i + 1]])};\n'
+                for i, (s, a) in enumerate(zip(source[row_starts].tolist(), action[row_starts].tolist()))))
+        file.write('\nendmodule\n\n')
+
+        for name, states in _labels(model, is_partially_obs).items():
+            condition = ' | '.join(f's={state}' for state in states.tolist()) if len(states) else 'false'
+            file.write(f'label "{name}" = {condition};\n')
+
+        file.write('\nrewards "reward"\n')
+        states, actions = np.nonzero(model.expected_reward)
+        rewards = model.expected_reward[states, actions]
+        for state, a, r in zip(states.tolist(), actions.tolist(), rewards.tolist()):
+            file.write(f'    [{ACTION_NAMES[a]}] s={state} : {r!r};\n')
+        file.write('endrewards\n')
+
+
+def _write_array(file, array):
+    # Streams a one-dimensional array as a JSON list
+    file.write('[')
+    for first in range(0, len(array), _CHUNK_SIZE):
+        if first:
+            file.write(',')
+        file.write(','.join(map(repr, array[first:first + _CHUNK_SIZE].tolist())))
+    file.write(']')
+
+
+def export_json(world, path, is_partially_obs=True, **kwargs):
+    """
+    Writes a world (parser, compiled world or sparse model) as JSON: states with their cell and output, and the
+    transitions as columns (source, action, target, probability, reward). Action ids index "actions".
+    """
+    model = _model(world, **kwargs)
+    world = model.compiled_world
+    columns = dict(zip(['source', 'action', 'target', 'probability', 'reward'], sparse_table(model)))
+
+    with open(path, 'w') as file:
+        header = {'n_states': model.n_states, 'initial_state': model.initial_state, 'actions': ACTION_NAMES,
+                  'height': world.height, 'width': world.width}
+        file.write(json.dumps(header)[:-1])
+        file.write(', "state_cells": ')
+        _write_array(file, model.state_cells)
+        file.write(', "outputs": ')
+        file.write(json.dumps(state_outputs(model, is_partially_obs)))
+        file.write(', "transitions": {')
+        for index, (name, column) in enumerate(columns.items()):
+            file.write(f'{", " if index else ""}"{name}": ')
+            _write_array(file, column)
+        file.write('}}\n')
+
+
+def export_npz(world, path, compressed=False, **kwargs):
+    """
+    Writes a world (parser, compiled world or sparse model) as a CSR transition table in a .npz file. The entries of
+    state s and action a are indptr[s * 4 + a]:indptr[s * 4 + a + 1] of target, probability and reward.
+    """
+    model = _model(world, **kwargs)
+    source, action, target, probability, reward = sparse_table(model)
+    indptr = np.zeros(model.n_states * 4 + 1, dtype=np.int64)
+    np.cumsum(np.bincount(source * 4 + action, minlength=model.n_states * 4), out=indptr[1:])
+
+    save = np.savez_compressed if compressed else np.savez
+    save(path, indptr=indptr, target=target, probability=probability, reward=reward,
+         state_cells=model.state_cells, initial_state=model.initial_state,
+         shape=np.array([model.compiled_world.height, model.compiled_world.width]))
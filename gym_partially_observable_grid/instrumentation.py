@@ -0,0 +1,128 @@
+from time import perf_counter_ns
+
+from gym_partially_observable_grid.compiled import TOGGLE, REWARD, GOAL, TERMINAL
+
+# Durations are counted in power-of-two buckets of nanoseconds: bucket b holds durations in [2 ** (b - 1), 2 ** b)
+_HISTOGRAM_BUCKETS = 64
+
+# Events counted per step; stochastic_steps are steps on a stochastic tile while stochastic behaviour is enabled
+EVENTS = ('stochastic_steps', 'slips', 'wall_hits', 'door_traversals', 'toggle_flips', 'reward_tiles_hit', 'goals',
+          'terminals')
+(_STOCHASTIC_STEP, _SLIP, _WALL_HIT, _DOOR_TRAVERSAL, _TOGGLE_FLIP, _REWARD_TILE_HIT, _GOAL,
+ _TERMINAL) = range(len(EVENTS))
+
+
+def _timing(count, total, histogram):
+    # Histograms map the upper bound (in ns) of every non-empty bucket to its count
+    return {'total_ns': total, 'mean_ns': total / count if count else 0.,
+            'histogram': {1 << bucket: n for bucket, n in enumerate(histogram) if n}}
+
+
+class InstrumentedWorld:
+    """
+    Opt-in instrumentation of a GridEngine or PartiallyObservableWorld (also one wrapped by gym.make): counts steps,
+    resets, slips per rule id, wall hits, door traversals, toggle flips and reward tiles hit, and keeps histograms of
+    step and reset durations. Events are derived from the transition the engine passes to its step_hook.
+    While disabled, step and reset are the bound methods of the wrapped environment and the hook is unset, so
+    instrumentation costs nothing and can stay in place permanently. All other attributes are those of the wrapped
+    environment.
+    """
+
+    def __init__(self, env, enabled=True):
+        self.env = env
+        self.engine = getattr(env, 'unwrapped', env)
+        # Rule of every cell, only read on slips
+        self._rule_index = self.engine.compiled_world.rule_index
+        self.reset_statistics()
+        self.enabled = enabled
+
+    def __getattr__(self, name):
+        if name == 'env':
+            raise AttributeError(name)
+        return getattr(self.env, name)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        self._enabled = enabled
+        self.step = self._step if enabled else self.env.step
+        self.reset = self._reset if enabled else self.env.reset
+        self.engine.step_hook = self._record if enabled else None
+
+    def reset_statistics(self):
+        self._steps, self._resets = 0, 0
+        # Count of every event and total duration of the steps in which it happened, in the order of EVENTS
+        self._counts = [0] * len(EVENTS)
+        self._event_time = [0] * len(EVENTS)
+        self._slips = [0] * len(self.engine.compiled_world.rule_ids)
+        self._step_time, self._step_histogram = 0, [0] * _HISTOGRAM_BUCKETS
+        self._reset_time, self._reset_histogram = 0, [0] * _HISTOGRAM_BUCKETS
+
+    def _count(self, event, duration):
+        self._counts[event] += 1
+        self._event_time[event] += duration
+
+    def _record(self, *transition):
+        self._transition = transition
+
+    def _step(self, action):
+        start = perf_counter_ns()
+        result = self.env.step(action)
+        duration = perf_counter_ns() - start
+
+        self._steps += 1
+        self._step_time += duration
+        self._step_histogram[duration.bit_length()] += 1
+
+        cell, executed, sampled, new_cell, door, flags = self._transition
+        if sampled:
+            self._count(_STOCHASTIC_STEP, duration)
+            if executed != action:
+                self._count(_SLIP, duration)
+                self._slips[self._rule_index[cell]] += 1
+        if new_cell < 0:
+            self._count(_WALL_HIT, duration)
+            return result
+        if door:
+            self._count(_DOOR_TRAVERSAL, duration)
+        if flags:
+            if flags & TOGGLE:
+                self._count(_TOGGLE_FLIP, duration)
+            if flags & REWARD:
+                self._count(_REWARD_TILE_HIT, duration)
+            if flags & GOAL:
+                self._count(_GOAL, duration)
+            if flags & TERMINAL:
+                self._count(_TERMINAL, duration)
+        return result
+
+    def _reset(self, *args, **kwargs):
+        start = perf_counter_ns()
+        observation = self.env.reset(*args, **kwargs)
+        duration = perf_counter_ns() - start
+
+        self._resets += 1
+        self._reset_time += duration
+        self._reset_histogram[duration.bit_length()] += 1
+        return observation
+
+    def snapshot(self):
+        """
+        Statistics collected since creation or the last reset_statistics, as a dict of plain Python values: counts
+        of steps, resets and every event, slips per rule id, timings of steps and resets, and the mean duration of
+        the steps in which every event happened.
+        """
+        rule_ids = self.engine.compiled_world.rule_ids
+        return {
+            'steps': self._steps,
+            'resets': self._resets,
+            **dict(zip(EVENTS, self._counts)),
+            'slips_per_rule': {rule_id: n for rule_id, n in zip(rule_ids, self._slips) if n},
+            'step_time': _timing(self._steps, self._step_time, self._step_histogram),
+            'reset_time': _timing(self._resets, self._reset_time, self._reset_histogram),
+            'mean_step_ns_by_event': {event: time / n for event, n, time in zip(EVENTS, self._counts,
+                                                                                self._event_time) if n},
+        }
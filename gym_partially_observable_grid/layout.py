@@ -0,0 +1,166 @@
+import weakref
+from functools import cached_property
+
+import numpy as np
+
+from gym_partially_observable_grid.cache import cache_key, load_world
+from gym_partially_observable_grid.tiled import TiledWorld, TiledObservationEncoder
+
+# Interned layouts by file content and options; layouts are dropped once no environment uses them
+_LAYOUTS = weakref.WeakValueDictionary()
+# Shared layouts attached in this process, by the name of their shared memory block
+_ATTACHED = weakref.WeakValueDictionary()
+
+
+def _freeze(obj):
+    for value in obj.__dict__.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+
+class WorldLayout:
+    """
+    Immutable static part of an environment: the compiled world and observation encoder of a world file with given
+    options. Everything that changes during an episode lives in the environment (see EnvState), so any number of
+    environments can share one layout. Layouts compare and hash by their key (file content and options), and their
+    arrays are read-only.
+    """
+
+    def __init__(self, key, compiled_world, encoder, indicate_wall=False, repeat=None):
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'compiled_world', compiled_world)
+        object.__setattr__(self, 'encoder', encoder)
+        # If abstraction is not defined, environment cannot be partially observable
+        object.__setattr__(self, 'is_partially_obs', encoder.is_partially_obs)
+        object.__setattr__(self, 'indicate_wall', indicate_wall)
+        object.__setattr__(self, 'repeat', repeat)
+        _freeze(getattr(compiled_world, 'base_world', compiled_world))
+        _freeze(encoder)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, WorldLayout) and self.key == other.key
+
+    def __reduce__(self):
+        return _intern, (self.key, self.compiled_world, self.encoder, self.indicate_wall, self.repeat)
+
+    def share(self):
+        """
+        Copy of the layout with its arrays in one multiprocessing.shared_memory block. Pickling the copy (e.g. to
+        pass it to worker processes) only sends the name of the block, and unpickled copies map the same memory.
+        The calling process owns the block and should call unlink once the layout is no longer needed.
+        """
+        from multiprocessing import shared_memory
+
+        # Tiled worlds are shared through their base world and rebuilt around it
+        world = self.compiled_world.base_world if self.repeat else self.compiled_world
+        parts = [_split(world)] + ([] if self.repeat else [_split(self.encoder)])
+
+        specs, offset = [], 0
+        for cls, meta, arrays in parts:
+            array_specs = dict()
+            for name, array in arrays.items():
+                array_specs[name] = (array.shape, array.dtype.str, offset)
+                offset += -(-array.nbytes // 8) * 8
+            specs.append((cls, meta, array_specs))
+
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (_, _, arrays), (_, _, array_specs) in zip(parts, specs):
+            for name, array in arrays.items():
+                shape, dtype, start = array_specs[name]
+                np.ndarray(shape, dtype, buffer=block.buf, offset=start)[...] = array
+        return _attach(block, specs, self.key, self.is_partially_obs, self.indicate_wall, self.repeat)
+
+
+def _intern(key, compiled_world, encoder, indicate_wall, repeat):
+    # Unpickled layouts are interned too, so that environments unpickled in the same process share them
+    layout = _LAYOUTS.get(key)
+    if layout is None:
+        layout = WorldLayout(key, compiled_world, encoder, indicate_wall, repeat)
+        _LAYOUTS[key] = layout
+    return layout
+
+
+def _split(obj):
+    # Class, plain attributes and arrays of a compiled world or encoder; cached views are left out
+    meta, arrays = dict(), dict()
+    for name, value in obj.__dict__.items():
+        if isinstance(getattr(type(obj), name, None), cached_property):
+            continue
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        else:
+            meta[name] = value
+    return type(obj), meta, arrays
+
+
+class SharedLayout(WorldLayout):
+    def __init__(self, key, compiled_world, encoder, indicate_wall, repeat, block, specs):
+        super().__init__(key, compiled_world, encoder, indicate_wall, repeat)
+        object.__setattr__(self, 'block', block)
+        object.__setattr__(self, '_specs', specs)
+
+    def share(self):
+        return self
+
+    def unlink(self):
+        # Removes the shared memory block once all processes that mapped it are done
+        self.block.unlink()
+
+    def __reduce__(self):
+        return _attach, (self.block.name, self._specs, self.key, self.is_partially_obs, self.indicate_wall,
+                         self.repeat)
+
+
+def _attach(block, specs, key, is_partially_obs, indicate_wall, repeat):
+    if isinstance(block, str):
+        if block in _ATTACHED:
+            return _ATTACHED[block]
+        from multiprocessing import shared_memory
+        block = shared_memory.SharedMemory(block)
+
+    objects = []
+    for cls, meta, array_specs in specs:
+        obj = cls.__new__(cls)
+        obj.__dict__.update(meta)
+        for name, (shape, dtype, offset) in array_specs.items():
+            setattr(obj, name, np.ndarray(shape, dtype, buffer=block.buf, offset=offset))
+        objects.append(obj)
+
+    if repeat:
+        compiled_world = TiledWorld(objects[0], *repeat)
+        encoder = TiledObservationEncoder(compiled_world, is_partially_obs, indicate_wall)
+    else:
+        compiled_world, encoder = objects
+
+    layout = SharedLayout(key, compiled_world, encoder, indicate_wall, repeat, block, specs)
+    _ATTACHED[block.name] = layout
+    _LAYOUTS.setdefault(key, layout)
+    return layout
+
+
+def load_layout(world_file_path, is_partially_obs=True, indicate_wall=False, cache_dir=None, repeat=None):
+    """
+    Layout of a world file with the given options (see PartiallyObservableWorld). Layouts are interned: as long as
+    a layout is in use, loading a file with the same content and options returns it instead of compiling the world
+    again.
+    """
+    repeat = tuple(repeat) if repeat is not None else None
+    key = (cache_key(world_file_path, is_partially_obs, indicate_wall), repeat)
+    layout = _LAYOUTS.get(key)
+    if layout is not None:
+        return layout
+
+    compiled_world, encoder = load_world(world_file_path, is_partially_obs, indicate_wall, cache_dir)
+    # If repeat = (repeat_x, repeat_y) is set, the world is the interior of the world file repeated repeat_x
+    # times horizontally and repeat_y times vertically (as written by world_scaler.py), without expanding it
+    if repeat is not None:
+        compiled_world = TiledWorld(compiled_world, *repeat)
+        encoder = TiledObservationEncoder(compiled_world, encoder.is_partially_obs, indicate_wall)
+
+    return _intern(key, compiled_world, encoder, indicate_wall, repeat)
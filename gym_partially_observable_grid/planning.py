@@ -0,0 +1,548 @@
+import copy
+import time
+
+import numpy as np
+
+from gym_partially_observable_grid.compiled import CompiledWorld, WALL, DOOR, GOAL, TERMINAL, REWARD, TOGGLE
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+
+
+def _outcomes(world, cells, stochastic):
+    # Executed actions and their probabilities for every (cell, action, outcome); rules apply where stochastic is set
+    executed = np.broadcast_to(np.arange(4)[None, :, None], (len(cells), 4, 4)).copy()
+    probabilities = np.zeros((len(cells), 4, 4))
+    probabilities[:, :, 0] = 1.
+
+    rule_index = world.rule_index[cells]
+    applied = np.flatnonzero((rule_index >= 0) & stochastic)
+    if len(applied):
+        rules = rule_index[applied]
+        executed[applied] = world.slip_actions[rules]
+        probabilities[applied] = np.diff(world.slip_cdf[rules], axis=2, prepend=0.)
+    return executed, probabilities
+
+
+class _SparseModel:
+    """
+    Sparse MDP. Transitions of state s and action a are the entries indptr[a * n_states + s]:indptr[a * n_states + s + 1]
+    of next_state, prob and reward. Rows are ordered by action first, so that reductions over actions run over
+    contiguous memory.
+    """
+
+    n_actions = 4
+
+    def _set_transitions(self, rows, next_state, prob, reward, executed_action, blocked):
+        if len(rows) > 1 and (np.diff(rows) < 0).any():
+            order = np.argsort(rows, kind='stable')
+            rows, next_state, prob, reward = rows[order], next_state[order], prob[order], reward[order]
+            executed_action, blocked = executed_action[order], blocked[order]
+
+        self.next_state = next_state
+        self.prob = prob
+        self.reward = reward.astype(np.float64)
+        # Executed action and whether the agent ran into a wall, for each entry
+        self.executed_action = executed_action.astype(np.int8)
+        self.blocked = blocked
+
+        self.indptr = np.zeros(self.n_states * 4 + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.n_states * 4), out=self.indptr[1:])
+
+        # Expected immediate reward of each (state, action), as a (n_states, 4) view of action-major memory
+        self.expected_reward = np.add.reduceat(self.prob * self.reward, self.indptr[:-1]).reshape(4, -1).T
+        self._backup = _Backup(self.indptr, self.next_state, self.prob)
+
+    @classmethod
+    def from_file(cls, world_file_path, **kwargs):
+        return cls(PartiallyObsGridworldParser(world_file_path), **kwargs)
+
+    def q_values(self, values, gamma):
+        return (self.expected_reward.T + gamma * self._backup(values).reshape(4, self.n_states)).T
+
+    def policy_rows(self, policy):
+        # Entry indices and row pointers of the transitions chosen by a deterministic policy
+        rows = policy * self.n_states + np.arange(self.n_states)
+        starts, counts = self.indptr[rows], self.indptr[rows + 1] - self.indptr[rows]
+        entries = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        policy_indptr = np.zeros(self.n_states + 1, dtype=np.int64)
+        np.cumsum(counts, out=policy_indptr[1:])
+        return entries, policy_indptr
+
+
+class TransitionModel(_SparseModel):
+    """
+    Sparse MDP of a world over its cells. Goal and terminal states are absorbing.
+    Rewards follow PartiallyObservableWorld.step with one_time_rewards=False and stochastic tiles are always enabled
+    (see AugmentedTransitionModel for the exact model).
+    """
+
+    def __init__(self, compiled_world, force_determinism=False, goal_reward=100, step_penalty=0):
+        if isinstance(compiled_world, PartiallyObsGridworldParser):
+            compiled_world = CompiledWorld(compiled_world)
+        world = compiled_world
+        self.compiled_world = world
+        step_penalty = step_penalty if step_penalty < 0 else step_penalty * -1
+
+        # States are all cells that can be occupied
+        self.state_cells = np.flatnonzero((world.flags & (WALL | DOOR)) == 0)
+        self.n_states = len(self.state_cells)
+        self.cell_state = np.full(world.n_cells, -1, dtype=np.int64)
+        self.cell_state[self.state_cells] = np.arange(self.n_states)
+        self.initial_state = int(self.cell_state[world.initial_cell])
+
+        flags = world.flags[self.state_cells]
+        self.terminal = (flags & (GOAL | TERMINAL)) != 0
+
+        # Reward received when entering a cell
+        entry_reward = np.where(world.flags & REWARD, world.rewards, 0).astype(np.float64)
+        entry_reward[(world.flags & GOAL) != 0] = goal_reward
+        entry_reward[(world.flags & TERMINAL) != 0] = goal_reward * -1
+        if step_penalty != 0:
+            entry_reward[entry_reward == 0] = step_penalty
+
+        # Candidate outcomes (state, action, outcome) with their executed action and probability
+        executed, probabilities = _outcomes(world, self.state_cells, not force_determinism)
+
+        next_cells = world.next_cell[self.state_cells[:, None, None], executed]
+        # Moves that do not end in an occupiable cell (walls, or walls right behind a door) keep the agent in place
+        blocked = (next_cells < 0) | (self.cell_state[next_cells] < 0)
+        next_states = np.where(blocked, np.arange(self.n_states)[:, None, None], self.cell_state[next_cells])
+        rewards = np.where(blocked, step_penalty, entry_reward[next_cells])
+
+        # Absorbing goal and terminal states
+        next_states[self.terminal] = np.arange(self.n_states)[self.terminal, None, None]
+        rewards[self.terminal] = 0.
+        blocked[self.terminal] = False
+        executed[self.terminal] = np.arange(4)[:, None]
+        probabilities[self.terminal] = 0.
+        probabilities[self.terminal, :, 0] = 1.
+
+        # Order entries by (action, state, outcome)
+        present = (probabilities > 0).transpose(1, 0, 2)
+        rows = np.broadcast_to((np.arange(4)[:, None] * self.n_states + np.arange(self.n_states))[:, :, None],
+                               present.shape)[present]
+        self._set_transitions(rows, next_states.transpose(1, 0, 2)[present],
+                              probabilities.transpose(1, 0, 2)[present], rewards.transpose(1, 0, 2)[present],
+                              executed.transpose(1, 0, 2)[present], blocked.transpose(1, 0, 2)[present])
+
+    def to_grid(self, state_values, fill_value=np.nan):
+        # Values of states laid out on the (height, width) grid of the world
+        grid = np.full(self.compiled_world.n_cells, fill_value, dtype=np.result_type(state_values, fill_value))
+        grid[self.state_cells] = state_values
+        return grid.reshape(self.compiled_world.height, self.compiled_world.width)
+
+
+class AugmentedTransitionModel(_SparseModel):
+    """
+    Exact MDP of PartiallyObservableWorld. States are the reachable triples (cell, use_stochastic_tiles,
+    collected rewards bitmask), discovered by a breadth-first search from the initial state, so memory is proportional
+    to the number of reachable states only. Toggles are tracked only if the world is stochastic, and collected
+    rewards only if one_time_rewards is set. Goal and terminal states are absorbing.
+    """
+
+    def __init__(self, compiled_world, force_determinism=False, goal_reward=100, one_time_rewards=True,
+                 step_penalty=0, max_states=10 ** 7):
+        if isinstance(compiled_world, PartiallyObsGridworldParser):
+            compiled_world = CompiledWorld(compiled_world)
+        world = compiled_world
+        self.compiled_world = world
+        step_penalty = step_penalty if step_penalty < 0 else step_penalty * -1
+        n_cells = world.n_cells
+        occupiable = (world.flags & (WALL | DOOR)) == 0
+
+        stochastic = not force_determinism
+        self.tracks_toggle = stochastic and len(world.rule_ids) > 0
+
+        # Bit of every one-time reward tile in the collected rewards mask
+        reward_cells = np.flatnonzero(world.flags & REWARD) if one_time_rewards else np.empty(0, dtype=np.int64)
+        if len(reward_cells) > 64:
+            raise ValueError(f'Exact model supports at most 64 one-time reward tiles, world has {len(reward_cells)}.')
+        self.reward_bit = np.zeros(n_cells, dtype=np.uint64)
+        self.reward_bit[reward_cells] = np.left_shift(np.uint64(1), np.arange(len(reward_cells), dtype=np.uint64))
+
+        # Distinct masks get small ids, so that (mask id, toggle, cell) fits into an int64 key
+        masks, mask_ids = [], dict()
+
+        def keys_of(cells, toggles, state_masks):
+            unique_masks, inverse = np.unique(state_masks, return_inverse=True)
+            for mask in unique_masks.tolist():
+                if mask not in mask_ids:
+                    mask_ids[mask] = len(masks)
+                    masks.append(mask)
+            ids = np.array([mask_ids[mask] for mask in unique_masks.tolist()], dtype=np.int64)[inverse.reshape(-1)]
+            return (ids * 2 + toggles) * n_cells + cells
+
+        state_index = dict()
+        frontier_cells = np.array([world.initial_cell], dtype=np.int64)
+        frontier_toggles = np.ones(1, dtype=np.int64)
+        frontier_masks = np.zeros(1, dtype=np.uint64)
+        state_index[int(keys_of(frontier_cells, frontier_toggles, frontier_masks)[0])] = 0
+        frontier = np.zeros(1, dtype=np.int64)
+        states = [(frontier_cells, frontier_toggles, frontier_masks)]
+        entries = []
+
+        while len(frontier):
+            n = len(frontier)
+            cells = frontier_cells[:, None, None]
+            toggles = frontier_toggles[:, None, None]
+            state_masks = frontier_masks[:, None, None]
+            terminal = (world.flags[frontier_cells] & (GOAL | TERMINAL)) != 0
+
+            # Rules apply while stochastic behaviour is on, and never if determinism is forced
+            executed, probabilities = _outcomes(world, frontier_cells, frontier_toggles.astype(bool) & stochastic)
+            next_cells = world.next_cell[cells, executed]
+            blocked = (next_cells < 0) | ~occupiable[next_cells]
+            next_cells = np.where(blocked, cells, next_cells)
+            flags = np.where(blocked, 0, world.flags[next_cells])
+
+            next_toggles = toggles ^ ((flags & TOGGLE) != 0) if self.tracks_toggle else np.broadcast_to(toggles, flags.shape)
+            bits = np.where(blocked, np.uint64(0), self.reward_bit[next_cells])
+            uncollected = (bits & state_masks) == 0
+            rewards = np.where((flags & REWARD) != 0, world.rewards[next_cells], 0).astype(np.float64)
+            rewards[~uncollected] = 0.
+            rewards[(flags & GOAL) != 0] = goal_reward
+            rewards[(flags & TERMINAL) != 0] = goal_reward * -1
+            if step_penalty != 0:
+                rewards[rewards == 0] = step_penalty
+            next_masks = state_masks | bits
+
+            # Absorbing goal and terminal states
+            next_cells[terminal], rewards[terminal], blocked[terminal] = cells[terminal], 0., False
+            next_toggles = np.where(terminal[:, None, None], toggles, next_toggles)
+            next_masks = np.where(terminal[:, None, None], state_masks, next_masks)
+            executed[terminal] = np.arange(4)[:, None]
+            probabilities[terminal] = 0.
+            probabilities[terminal, :, 0] = 1.
+
+            present = probabilities > 0
+            keys = keys_of(next_cells[present], next_toggles[present].astype(np.int64), next_masks[present])
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            ids = np.array([state_index.get(key, -1) for key in unique_keys.tolist()], dtype=np.int64)
+            new = np.flatnonzero(ids < 0)
+            ids[new] = len(state_index) + np.arange(len(new))
+            state_index.update(zip(unique_keys[new].tolist(), ids[new].tolist()))
+            if len(state_index) > max_states:
+                raise ValueError(f'More than {max_states} reachable states.')
+
+            sources = np.broadcast_to(frontier[:, None, None], present.shape)[present]
+            actions = np.broadcast_to(np.arange(4)[None, :, None], present.shape)[present]
+            entries.append((actions, sources, ids[inverse.reshape(-1)], probabilities[present], rewards[present],
+                            executed[present], blocked[present]))
+
+            # Newly discovered states form the next frontier
+            frontier = ids[new]
+            frontier_cells = unique_keys[new] % n_cells
+            frontier_toggles = (unique_keys[new] // n_cells) % 2
+            frontier_masks = np.array([masks[i] for i in (unique_keys[new] // n_cells // 2).tolist()], dtype=np.uint64)
+            states.append((frontier_cells, frontier_toggles, frontier_masks))
+
+        self.n_states = len(state_index)
+        self.initial_state = 0
+        self.state_cells = np.concatenate([s[0] for s in states])
+        self.state_toggles = np.concatenate([s[1] for s in states]).astype(bool)
+        self.state_masks = np.concatenate([s[2] for s in states])
+        self.terminal = (world.flags[self.state_cells] & (GOAL | TERMINAL)) != 0
+
+        # Sorted keys allow mapping environment states to model states without keeping the dictionary
+        self._mask_ids = mask_ids
+        self._keys = np.fromiter(state_index.keys(), dtype=np.int64, count=self.n_states)
+        self._key_states = np.fromiter(state_index.values(), dtype=np.int64, count=self.n_states)
+        order = np.argsort(self._keys)
+        self._keys, self._key_states = self._keys[order], self._key_states[order]
+
+        actions, sources, next_states, prob, rewards, executed, blocked = [np.concatenate(c) for c in zip(*entries)]
+        self._set_transitions(actions * self.n_states + sources, next_states, prob, rewards, executed, blocked)
+
+    def state_of(self, player_location, use_stochastic_tiles=True, collected_rewards=()):
+        """Model state of an environment state, -1 if it is not reachable."""
+        cell = self.compiled_world.cell(player_location)
+        toggle = int(use_stochastic_tiles) if self.tracks_toggle else 1
+        mask = 0
+        for location in collected_rewards:
+            mask |= int(self.reward_bit[self.compiled_world.cell(location)])
+        if mask not in self._mask_ids:
+            return -1
+        key = (self._mask_ids[mask] * 2 + toggle) * self.compiled_world.n_cells + cell
+        position = np.searchsorted(self._keys, key)
+        if position < self.n_states and self._keys[position] == key:
+            return int(self._key_states[position])
+        return -1
+
+
+class _Backup:
+    """
+    Expected next-state value of every row of a sparse transition table. Most rows are deterministic, so the first
+    entry of every row is handled as a dense gather and only the remaining entries are accumulated sparsely.
+    """
+
+    def __init__(self, indptr, next_state, prob):
+        first = indptr[:-1]
+        self.first_next, self.first_prob = next_state[first], prob[first]
+        self.deterministic = bool((self.first_prob == 1.).all())
+        rest = np.ones(len(next_state), dtype=bool)
+        rest[first] = False
+        self.rest_rows = np.repeat(np.arange(len(first)), np.diff(indptr))[rest]
+        self.rest_next, self.rest_prob = next_state[rest], prob[rest]
+
+    def __call__(self, values):
+        expected = values[self.first_next]
+        if not self.deterministic:
+            expected *= self.first_prob
+        if len(self.rest_rows):
+            expected += np.bincount(self.rest_rows, self.rest_prob * values[self.rest_next], len(expected))
+        return expected
+
+
+class PlanningResult:
+    def __init__(self, values, policy, iterations, converged, residuals, sweeps, elapsed):
+        # Optimal (or last) state values and a greedy policy with respect to them
+        self.values = values
+        self.policy = policy
+        # Number of outer iterations, whether the tolerance was reached and the max-norm residual of each iteration
+        self.iterations = iterations
+        self.converged = converged
+        self.residuals = residuals
+        # Total number of Bellman backups over the whole state space
+        self.sweeps = sweeps
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f'PlanningResult(iterations={self.iterations}, converged={self.converged}, sweeps={self.sweeps}, '
+                f'residual={self.residuals[-1] if self.residuals else None}, elapsed={self.elapsed:.3f}s)')
+
+
+def _residual(new_values, values):
+    # Max-norm change; values that stay infinite do not count
+    change = np.subtract(new_values, values, out=np.zeros_like(values), where=new_values != values)
+    return float(np.abs(change).max())
+
+
+def value_iteration(model, gamma=0.99, tol=1e-6, max_iterations=100000, values=None):
+    start = time.perf_counter()
+    values = np.zeros(model.n_states) if values is None else values.astype(np.float64)
+    residuals = []
+    converged = False
+    for _ in range(max_iterations):
+        new_values = model.q_values(values, gamma).max(axis=1)
+        residuals.append(float(np.abs(new_values - values).max()))
+        values = new_values
+        if residuals[-1] < tol:
+            converged = True
+            break
+
+    policy = model.q_values(values, gamma).argmax(axis=1)
+    return PlanningResult(values, policy, len(residuals), converged, residuals, len(residuals),
+                          time.perf_counter() - start)
+
+
+def _evaluate_policy(model, policy, values, gamma, sweeps, tol=None):
+    # Iterative evaluation; stops after the given number of sweeps or once the residual drops below tol
+    entries, policy_indptr = model.policy_rows(policy)
+    backup = _Backup(policy_indptr, model.next_state[entries], model.prob[entries])
+    reward = model.expected_reward[np.arange(model.n_states), policy]
+    done = 0
+    for done in range(1, sweeps + 1):
+        new_values = reward + gamma * backup(values)
+        converged = tol is not None and _residual(new_values, values) < tol
+        values = new_values
+        if converged:
+            break
+    return values, done
+
+
+def _solve_policy(model, policy, gamma):
+    # Exact evaluation by solving (I - gamma * P_pi) v = r_pi with scipy, if available
+    from scipy.sparse import csr_matrix, identity
+    from scipy.sparse.linalg import spsolve
+
+    entries, policy_indptr = model.policy_rows(policy)
+    transitions = csr_matrix((model.prob[entries], model.next_state[entries], policy_indptr),
+                             shape=(model.n_states, model.n_states))
+    reward = model.expected_reward[np.arange(model.n_states), policy]
+    return spsolve((identity(model.n_states, format='csr') - gamma * transitions).tocsc(), reward)
+
+
+def modified_policy_iteration(model, gamma=0.99, tol=1e-6, evaluation_sweeps=20, max_iterations=100000,
+                              values=None):
+    start = time.perf_counter()
+    values = np.zeros(model.n_states) if values is None else values.astype(np.float64)
+    residuals = []
+    sweeps = 0
+    converged = False
+    for _ in range(max_iterations):
+        q_values = model.q_values(values, gamma)
+        policy = q_values.argmax(axis=1)
+        improved = q_values.max(axis=1)
+        residuals.append(_residual(improved, values))
+        sweeps += 1
+        if residuals[-1] < tol:
+            values = improved
+            converged = True
+            break
+        values, done = _evaluate_policy(model, policy, improved, gamma, evaluation_sweeps)
+        sweeps += done
+
+    policy = model.q_values(values, gamma).argmax(axis=1)
+    return PlanningResult(values, policy, len(residuals), converged, residuals, sweeps,
+                          time.perf_counter() - start)
+
+
+def policy_iteration(model, gamma=0.99, tol=1e-6, max_iterations=1000, max_evaluation_sweeps=100000):
+    """
+    Policy iteration. Policies are evaluated exactly with a sparse solve if scipy is installed, otherwise
+    iteratively until the residual drops below tol.
+    """
+    try:
+        import scipy  # noqa: F401
+        exact = True
+    except ImportError:
+        exact = False
+
+    start = time.perf_counter()
+    values = np.zeros(model.n_states)
+    policy = np.zeros(model.n_states, dtype=np.int64)
+    residuals = []
+    sweeps = 0
+    converged = False
+    for _ in range(max_iterations):
+        if exact:
+            new_values = _solve_policy(model, policy, gamma)
+        else:
+            new_values, done = _evaluate_policy(model, policy, values, gamma, max_evaluation_sweeps, tol)
+            sweeps += done
+        residuals.append(float(np.abs(new_values - values).max()))
+        values = new_values
+
+        q_values = model.q_values(values, gamma)
+        sweeps += 1
+        # Keep the current action on ties, so that the iteration terminates
+        current = q_values[np.arange(model.n_states), policy]
+        new_policy = np.where(q_values.max(axis=1) > current + tol, q_values.argmax(axis=1), policy)
+        if np.array_equal(new_policy, policy):
+            converged = True
+            break
+        policy = new_policy
+
+    return PlanningResult(values, policy, len(residuals), converged, residuals, sweeps,
+                          time.perf_counter() - start)
+
+
+class DistanceField:
+    """
+    Distance to the closest goal of every cell and the action of a shortest path, as dense arrays over cell ids.
+    Distances are step counts (int32, -1 for walls, doors and cells that cannot reach a goal) or, for expected
+    fields, expected step counts under stochastic tiles (float64, inf where a goal cannot be reached for sure).
+    actions is -1 for goals and for cells without a distance.
+    """
+
+    def __init__(self, compiled_world, distances, actions, expected=False):
+        self.compiled_world = compiled_world
+        self.distances = distances
+        self.actions = actions
+        self.expected = expected
+
+    def distance(self, location):
+        return self.distances[self.compiled_world.cell(location)]
+
+    def action(self, location):
+        return int(self.actions[self.compiled_world.cell(location)])
+
+    def to_grid(self):
+        return self.distances.reshape(self.compiled_world.height, self.compiled_world.width)
+
+
+def _greedy_actions(costs, valid):
+    # Cheapest action of every cell among valid moves, -1 if there is none
+    costs = np.where(valid, costs, np.inf)
+    return np.where(np.isfinite(costs).any(axis=1), costs.argmin(axis=1), -1).astype(np.int8)
+
+
+def distance_field(compiled_world):
+    """
+    Shortest-path distances to the goals, computed by a breadth-first search from all goals at once over reversed
+    moves. Moves follow PartiallyObservableWorld.step without stochastic tiles: walls block, doors are passed
+    through, and goal and terminal tiles end the episode, so no path leads through them.
+    """
+    world = compiled_world
+    flags = np.asarray(world.flags)
+    next_cell = np.asarray(world.next_cell).reshape(world.n_cells, 4)
+    occupiable = (flags & (WALL | DOOR)) == 0
+
+    # Moves between occupiable cells, out of cells where the episode goes on, grouped by their target
+    sources = np.flatnonzero(occupiable & ((flags & (GOAL | TERMINAL)) == 0))
+    targets = next_cell[sources]
+    valid = (targets >= 0) & occupiable[np.maximum(targets, 0)]
+    move_sources = np.broadcast_to(sources[:, None], targets.shape)[valid]
+    move_targets = targets[valid]
+    move_sources = move_sources[np.argsort(move_targets, kind='stable')]
+    indptr = np.zeros(world.n_cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(move_targets, minlength=world.n_cells), out=indptr[1:])
+
+    distances = np.full(world.n_cells, -1, dtype=np.int32)
+    frontier = np.flatnonzero(flags & GOAL)
+    distances[frontier] = 0
+    distance = 0
+    while len(frontier):
+        distance += 1
+        starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+        previous = move_sources[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        frontier = np.unique(previous[distances[previous] < 0])
+        distances[frontier] = distance
+
+    valid = (next_cell >= 0) & (distances[np.maximum(next_cell, 0)] >= 0) & (distances > 0)[:, None]
+    actions = _greedy_actions(distances[np.maximum(next_cell, 0)], valid)
+    return DistanceField(world, distances, actions)
+
+
+def _almost_surely_reaching(model, goals, reaching):
+    # States from which some policy reaches a goal with probability one: the largest subset of reaching (the states
+    # that can reach a goal at all) whose states reach a goal with actions that cannot leave the subset
+    rows = np.repeat(np.arange(model.n_states * 4), np.diff(model.indptr))
+    sources = rows % model.n_states
+    while True:
+        leaving = np.bincount(rows, ~reaching[model.next_state], model.n_states * 4) > 0
+        kept = ~leaving[rows] & reaching[sources]
+        edge_sources, edge_targets = sources[kept], model.next_state[kept]
+        edge_sources = edge_sources[np.argsort(edge_targets, kind='stable')]
+        indptr = np.zeros(model.n_states + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_targets, minlength=model.n_states), out=indptr[1:])
+
+        reached = goals.copy()
+        frontier = np.flatnonzero(goals)
+        while len(frontier):
+            starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+            previous = edge_sources[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+            frontier = np.unique(previous[~reached[previous]])
+            reached[frontier] = True
+
+        if np.array_equal(reached, reaching):
+            return reached
+        reaching = reached
+
+
+def expected_distance_field(compiled_world, tol=1e-9, max_iterations=100000, evaluation_sweeps=100):
+    """
+    Minimal expected number of steps to a goal when stochastic tiles are enabled. Computed by
+    modified_policy_iteration over TransitionModel with a reward of -1 per step and no discount, starting from the
+    shortest-path distances (which are a lower bound). Running into a wall costs a step, and the distance is inf where
+    no policy reaches a goal with probability one, e.g. if a slip may lead onto a terminal tile.
+    """
+    world = compiled_world
+    shortest = world.distance_field.distances
+    model = TransitionModel(world)
+    cells = model.state_cells
+
+    # Same transitions, but every step out of a non-absorbing state costs one. States that cannot reach a goal with
+    # probability one start (and stay) at -inf, so that the iteration only runs over finite values.
+    costs = copy.copy(model)
+    costs.expected_reward = np.repeat(np.where(model.terminal, 0., -1.)[:, None], 4, axis=1)
+    reaching = _almost_surely_reaching(model, shortest[cells] == 0, shortest[cells] >= 0)
+    values = -np.where(reaching, shortest[cells], np.inf).astype(np.float64)
+    result = modified_policy_iteration(costs, gamma=1., tol=tol, evaluation_sweeps=evaluation_sweeps,
+                                       max_iterations=max_iterations, values=values)
+
+    distances = np.full(world.n_cells, np.inf)
+    distances[cells] = -result.values
+    actions = np.full(world.n_cells, -1, dtype=np.int8)
+    q_values = -costs.q_values(result.values, 1.)
+    actions[cells] = _greedy_actions(q_values, np.isfinite(q_values) & ~model.terminal[:, None])
+    return DistanceField(world, distances, actions, expected=True)
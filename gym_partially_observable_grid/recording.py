@@ -0,0 +1,166 @@
+import json
+import os
+from collections import namedtuple
+
+import gym
+import numpy as np
+
+# Columns of recorded transitions: observation after the step, action, reward and done flag
+COLUMNS = {'observations': np.int64, 'actions': np.int8, 'rewards': np.float64, 'dones': np.bool_}
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Recorded episode; observations start with the observation returned by reset, so they are one longer than actions
+Episode = namedtuple('Episode', ['observations', 'actions', 'rewards', 'dones'])
+
+
+def _chunk_path(directory, name, chunk):
+    return os.path.join(directory, f'{name}_{chunk:05d}.npy')
+
+
+def _remove_recording(directory):
+    # Index and chunk files of a recording; other files in the directory are kept
+    names = tuple(COLUMNS) + ('episodes',)
+    for file_name in os.listdir(directory):
+        if file_name == 'index.json' or (file_name.endswith('.npy') and file_name.rsplit('_', 1)[0] in names):
+            os.remove(os.path.join(directory, file_name))
+
+
+class TrajectoryWriter:
+    """
+    Writes transitions into preallocated column buffers of chunk_size entries. Full chunks are saved to one .npy file
+    per column, together with the index of the episodes that started in them (start transition and initial
+    observation) and an index.json file describing all saved chunks.
+    A directory that is not empty raises FileExistsError, unless overwrite is set, in which case an earlier
+    recording in it is removed.
+    """
+
+    def __init__(self, directory, chunk_size=DEFAULT_CHUNK_SIZE, overwrite=False):
+        os.makedirs(directory, exist_ok=True)
+        if os.listdir(directory):
+            if not overwrite:
+                raise FileExistsError(f'{directory} is not empty; pass overwrite=True to replace its recording')
+            _remove_recording(directory)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.buffers = {name: np.empty(chunk_size, dtype=dtype) for name, dtype in COLUMNS.items()}
+        # Memoryviews give fast scalar writes without numpy overhead
+        self._observations, self._actions, self._rewards, self._dones = [memoryview(b) for b in self.buffers.values()]
+        self._position = 0
+        self.n_transitions = 0
+        self.chunk_lengths = []
+        # (start transition, initial observation) of episodes that started since the last flush
+        self._episodes = []
+
+    def start_episode(self, observation):
+        self._episodes.append((self.n_transitions, observation))
+
+    def add(self, observation, action, reward, done):
+        position = self._position
+        self._observations[position] = observation
+        self._actions[position] = action
+        self._rewards[position] = reward
+        self._dones[position] = done
+        self._position = position + 1
+        self.n_transitions += 1
+        if self._position == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._position == 0 and not self._episodes:
+            return
+        chunk = len(self.chunk_lengths)
+        for name, buffer in self.buffers.items():
+            np.save(_chunk_path(self.directory, name, chunk), buffer[:self._position])
+        np.save(_chunk_path(self.directory, 'episodes', chunk), np.array(self._episodes, dtype=np.int64).reshape(-1, 2))
+        self.chunk_lengths.append(self._position)
+        self._position = 0
+        self._episodes = []
+
+        index = {'chunk_lengths': self.chunk_lengths,
+                 'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}}
+        with open(os.path.join(self.directory, 'index.json'), 'w') as file:
+            json.dump(index, file)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Reads episodes written by a TrajectoryWriter. Only the episode index is loaded; chunks are memory-mapped when an
+    episode that uses them is read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as file:
+            index = json.load(file)
+        self.chunk_lengths = index['chunk_lengths']
+        self.offsets = np.concatenate([[0], np.cumsum(self.chunk_lengths)]).astype(np.int64)
+        self.n_transitions = int(self.offsets[-1])
+
+        episodes = np.concatenate([np.load(_chunk_path(directory, 'episodes', chunk))
+                                   for chunk in range(len(self.chunk_lengths))])
+        self.starts, self.initial_observations = episodes[:, 0], episodes[:, 1]
+        self.ends = np.append(self.starts[1:], self.n_transitions)
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def chunk(self, name, chunk):
+        # Memory-mapped chunk of a column
+        key = (name, chunk)
+        if key not in self._chunks:
+            self._chunks[key] = np.load(_chunk_path(self.directory, name, chunk), mmap_mode='r')
+        return self._chunks[key]
+
+    def column(self, name, start, end):
+        # Transitions [start, end) of a column, which may span several chunks
+        if start >= end:
+            return np.empty(0, dtype=COLUMNS[name])
+        first = int(np.searchsorted(self.offsets, start, side='right')) - 1
+        last = int(np.searchsorted(self.offsets, end, side='left'))
+        parts = [self.chunk(name, chunk)[max(start - self.offsets[chunk], 0):end - self.offsets[chunk]]
+                 for chunk in range(first, max(last, first + 1))]
+        return np.array(parts[0]) if len(parts) == 1 else np.concatenate(parts)
+
+    def __getitem__(self, episode):
+        start, end = int(self.starts[episode]), int(self.ends[episode])
+        observations = np.concatenate([[self.initial_observations[episode]],
+                                       self.column('observations', start, end)])
+        return Episode(observations, *[self.column(name, start, end) for name in ('actions', 'rewards', 'dones')])
+
+    def __iter__(self):
+        for episode in range(len(self)):
+            yield self[episode]
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every episode of the wrapped environment with a TrajectoryWriter. Call close to save the last chunk.
+    """
+
+    def __init__(self, env, directory, chunk_size=DEFAULT_CHUNK_SIZE, overwrite=False):
+        super().__init__(env)
+        self.writer = TrajectoryWriter(directory, chunk_size, overwrite)
+
+    def reset(self, **kwargs):
+        observation = self.env.reset(**kwargs)
+        self.writer.start_episode(observation)
+        return observation
+
+    def step(self, action):
+        observation, reward, done, info = self.env.step(action)
+        self.writer.add(observation, action, reward, done)
+        return observation, reward, done, info
+
+    def close(self):
+        self.writer.close()
+        return self.env.close()
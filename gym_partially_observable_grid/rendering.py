@@ -0,0 +1,119 @@
+import numpy as np
+
+# RGB colors of layout tiles; other symbols are drawn in DEFAULT_COLOR
+TILE_COLORS = {
+    '#': (60, 60, 60),
+    ' ': (235, 235, 235),
+    'D': (150, 100, 50),
+    'G': (60, 180, 75),
+    'T': (210, 50, 50),
+    '@': (70, 130, 200),
+    'E': (245, 190, 20),
+}
+DEFAULT_COLOR = (180, 180, 180)
+
+_AGENT, _NEWLINE = ord('E'), ord('\n')
+
+
+def tile_atlas(tile_size=8):
+    # RGB tile of every symbol, indexed by its code; the last row and column of each tile are darker grid lines
+    atlas = np.empty((256, tile_size, tile_size, 3), dtype=np.uint8)
+    atlas[:] = DEFAULT_COLOR
+    for symbol, color in TILE_COLORS.items():
+        atlas[ord(symbol)] = color
+    if tile_size > 2:
+        atlas[:, -1, :] = atlas[:, -1, :] * 0.8
+        atlas[:, :-1, -1] = atlas[:, :-1, -1] * 0.8
+    return atlas
+
+
+class Renderer:
+    """
+    Renders a compiled world with the agent (drawn as 'E') in a given cell, as text ('ansi') or as an RGB image
+    ('rgb_array'). Frames of the whole world are built once and each call only patches the agent cell. Full RGB frames
+    are returned as a copy, unless shared_frame is set: then they are a read-only view of the frame, which the next
+    call updates in place.
+    With a viewport of (rows, columns), only the part of the world around the agent is rendered, so that the cost of
+    a frame does not depend on the size of the world.
+    """
+
+    def __init__(self, compiled_world, tile_size=8):
+        self.compiled_world = compiled_world
+        self.tile_size = tile_size
+        self.atlas = tile_atlas(tile_size)
+        # Full frames, built on first use: characters with a newline column, and RGB pixels
+        self._char_frame = None
+        self._rgb_frame = None
+        # Read-only view of the RGB frame and the cell the agent is drawn in
+        self._rgb_view = None
+        self._rgb_agent_cell = None
+
+    def render(self, cell, mode='ansi', viewport=None, shared_frame=False):
+        if mode == 'ansi':
+            return self.ansi(cell, viewport)
+        if mode == 'rgb_array':
+            return self.rgb_array(cell, viewport, shared_frame)
+        raise ValueError(f'Unsupported render mode: {mode}')
+
+    def _window(self, cell, viewport):
+        # Rows [x0, x1) and columns [y0, y1) around the cell, kept inside the world
+        height, width = self.compiled_world.height, self.compiled_world.width
+        if viewport is None:
+            return 0, height, 0, width
+        x, y = divmod(cell, width)
+        rows, columns = min(viewport[0], height), min(viewport[1], width)
+        x0 = min(max(x - rows // 2, 0), height - rows)
+        y0 = min(max(y - columns // 2, 0), width - columns)
+        return x0, x0 + rows, y0, y0 + columns
+
+    def _tiles(self, cell, viewport):
+        # Tiles of the viewport with the agent patched in
+        x0, x1, y0, y1 = self._window(cell, viewport)
+        width = self.compiled_world.width
+        cells = np.arange(x0, x1)[:, None] * width + np.arange(y0, y1)[None, :]
+        tiles = np.asarray(self.compiled_world.tiles[cells.reshape(-1)], dtype=np.uint8).reshape(cells.shape)
+        x, y = divmod(cell, width)
+        tiles[x - x0, y - y0] = _AGENT
+        return tiles
+
+    def ansi(self, cell, viewport=None):
+        if viewport is not None:
+            tiles = self._tiles(cell, viewport)
+            frame = np.concatenate([tiles, np.full((len(tiles), 1), _NEWLINE, dtype=np.uint8)], axis=1)
+            return frame.tobytes().decode('latin-1')[:-1]
+
+        if self._char_frame is None:
+            height, width = self.compiled_world.height, self.compiled_world.width
+            self._char_frame = np.full((height, width + 1), _NEWLINE, dtype=np.uint8)
+            self._char_frame[:, :-1] = np.asarray(self.compiled_world.tiles).reshape(height, width)
+        x, y = divmod(cell, self.compiled_world.width)
+        tile = self._char_frame[x, y]
+        self._char_frame[x, y] = _AGENT
+        frame = self._char_frame.tobytes().decode('latin-1')[:-1]
+        self._char_frame[x, y] = tile
+        return frame
+
+    def rgb_array(self, cell, viewport=None, shared_frame=False):
+        size = self.tile_size
+        if viewport is not None:
+            tiles = self._tiles(cell, viewport)
+            rows, columns = tiles.shape
+            return self.atlas[tiles].transpose(0, 2, 1, 3, 4).reshape(rows * size, columns * size, 3)
+
+        if self._rgb_frame is None:
+            height, width = self.compiled_world.height, self.compiled_world.width
+            tiles = np.asarray(self.compiled_world.tiles).reshape(height, width)
+            self._rgb_frame = self.atlas[tiles].transpose(0, 2, 1, 3, 4).reshape(height * size, width * size, 3)
+            self._rgb_view = self._rgb_frame.view()
+            self._rgb_view.flags.writeable = False
+        if cell != self._rgb_agent_cell:
+            if self._rgb_agent_cell is not None:
+                self._draw_tile(self._rgb_agent_cell, self.compiled_world.tiles[self._rgb_agent_cell])
+            self._draw_tile(cell, _AGENT)
+            self._rgb_agent_cell = cell
+        return self._rgb_view if shared_frame else self._rgb_frame.copy()
+
+    def _draw_tile(self, cell, symbol):
+        size = self.tile_size
+        x, y = divmod(cell, self.compiled_world.width)
+        self._rgb_frame[x * size:(x + 1) * size, y * size:(y + 1) * size] = self.atlas[symbol]
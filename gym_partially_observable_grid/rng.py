@@ -0,0 +1,61 @@
+import numpy as np
+
+# Uniform draws are taken from generators in blocks of this size. Every engine consumes exactly one uniform per step
+# on an active stochastic tile and draws the next block once a block is used up, so single and batched engines with
+# the same seed sample the same slips.
+UNIFORM_BLOCK_SIZE = 256
+
+
+def seed_sequence(seed=None):
+    # Seeds are None (fresh entropy), integers or SeedSequences
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def lane_seeds(seed, num_envs):
+    """
+    Seed sequences of the lanes of a batch. Lane i of a batched engine seeded with seed behaves exactly like a
+    PartiallyObservableWorld seeded with lane_seeds(seed, num_envs)[i].
+    """
+    return seed_sequence(seed).spawn(num_envs)
+
+
+def generator(seed=None):
+    return np.random.Generator(np.random.PCG64(seed_sequence(seed)))
+
+
+def freeze_state(state):
+    # States of bit generators are nested dictionaries; frozen states are hashable tuples
+    if isinstance(state, dict):
+        return tuple((key, freeze_state(value)) for key, value in state.items())
+    return state
+
+
+def thaw_state(frozen):
+    if isinstance(frozen, tuple):
+        return {key: thaw_state(value) for key, value in frozen}
+    return frozen
+
+
+class UniformBlocks:
+    """
+    Streams of uniform draws of a batch of lanes, each drawn from its own generator in blocks of UNIFORM_BLOCK_SIZE.
+    """
+
+    def __init__(self, seeds):
+        self.generators = [generator(seed) for seed in seeds]
+        self.blocks = np.empty((len(self.generators), UNIFORM_BLOCK_SIZE), dtype=np.float64)
+        self.positions = np.zeros(len(self.generators), dtype=np.int64)
+        for lane in range(len(self.generators)):
+            self._draw(lane)
+
+    def _draw(self, lane):
+        self.blocks[lane] = self.generators[lane].random(UNIFORM_BLOCK_SIZE)
+        self.positions[lane] = 0
+
+    def take(self, lanes):
+        # Next uniform of each of the given (distinct) lanes
+        uniforms = self.blocks[lanes, self.positions[lanes]]
+        self.positions[lanes] += 1
+        for lane in lanes[self.positions[lanes] == UNIFORM_BLOCK_SIZE].tolist():
+            self._draw(lane)
+        return uniforms
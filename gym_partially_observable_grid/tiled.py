@@ -0,0 +1,312 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+from gym_partially_observable_grid.compiled import CompiledWorld, ACTION_DELTAS, WALL, GOAL
+from gym_partially_observable_grid.encoding import ObservationEncoder
+
+_WALL_TILE, _DOOR_TILE, _GOAL_TILE, _EMPTY_TILE = ord('#'), ord('D'), ord('G'), ord(' ')
+
+
+class TiledArray(NDArrayOperatorsMixin):
+    """
+    Read-only array whose values are computed when they are indexed. Indexing with integers calls scalar, a plain
+    Python function of the flat index that is used in the step of the environment; indexing with arrays calls
+    vector, its NumPy counterpart. Any other use (arithmetic, np.asarray, slicing) materializes the whole array.
+    """
+
+    def __init__(self, shape, dtype, scalar, vector):
+        self.shape = tuple(shape)
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        self.dtype = np.dtype(dtype)
+        self._scalar, self._vector = scalar, vector
+
+    def __len__(self):
+        return self.shape[0]
+
+    def reshape(self, *shape):
+        shape = shape[0] if len(shape) == 1 and isinstance(shape[0], tuple) else shape
+        if -1 in shape:
+            known = int(np.prod([n for n in shape if n != -1]))
+            shape = tuple(self.size // known if n == -1 else n for n in shape)
+        assert np.prod(shape) == self.size
+        return TiledArray(shape, self.dtype, self._scalar, self._vector)
+
+    def __getitem__(self, index):
+        if self.ndim == 1 and isinstance(index, (int, np.integer)):
+            return self._scalar(int(index) if index >= 0 else int(index) + self.size)
+
+        index = index if isinstance(index, tuple) else (index,)
+        if len(index) != self.ndim or any(isinstance(i, slice) or i is None or i is Ellipsis for i in index):
+            return np.asarray(self)[index]
+        index = [np.flatnonzero(i) if np.asarray(i).dtype == bool else i for i in index]
+
+        flat = 0
+        for axis, i in enumerate(np.broadcast_arrays(*[np.asarray(i) for i in index])):
+            flat = flat * self.shape[axis] + np.where(i < 0, i + self.shape[axis], i)
+        if flat.ndim == 0:
+            return self._scalar(int(flat))
+        return self._vector(flat.reshape(-1)).astype(self.dtype, copy=False).reshape(flat.shape)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self._vector(np.arange(self.size)).astype(self.dtype, copy=False).reshape(self.shape)
+        return values if dtype is None else values.astype(dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(i) if isinstance(i, TiledArray) else i for i in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+
+class TiledWorld(CompiledWorld):
+    """
+    World that repeats the interior of a compiled base world repeat_x times horizontally and repeat_y times
+    vertically inside a border of walls, that is, the world written by world_scaler.create_world. Per-cell arrays
+    are TiledArrays that look values up in the base world with modular arithmetic, so memory does not grow with the
+    number of repeats. As in world_scaler, only the last goal (in row-major order) is kept. The agent starts at the
+    initial location of the base world, in the first repeat.
+    """
+
+    def __init__(self, base_world, repeat_x, repeat_y):
+        assert repeat_x >= 1 and repeat_y >= 1
+        self.base_world = base_world
+        self.repeat_x, self.repeat_y = repeat_x, repeat_y
+
+        # Size of the repeated interior of the base world
+        self._h, self._w = base_world.height - 2, base_world.width - 2
+        self._base_width = base_world.width
+
+        self.height, self.width = self._h * repeat_y + 2, self._w * repeat_x + 2
+        self.n_cells = self.height * self.width
+        interior = base_world.tiles.reshape(base_world.height, base_world.width)[1:-1, 1:-1]
+        self.state_space = int(np.count_nonzero((interior != _WALL_TILE) & (interior != _DOOR_TILE))) \
+            * repeat_x * repeat_y
+
+        self.abstract_symbol_name_map = base_world.abstract_symbol_name_map
+        self.rules = base_world.rules
+        self.rule_ids = base_world.rule_ids
+        self.slip_actions = base_world.slip_actions
+        self.slip_cdf = base_world.slip_cdf
+
+        x, y = base_world.initial_location
+        self.initial_cell = x * self.width + y
+        # Last goal of the base interior, in the last repeat
+        base_goals = np.flatnonzero(np.asarray(base_world.flags).reshape(base_world.height, base_world.width)
+                                    [1:-1, 1:-1].reshape(-1) & GOAL)
+        self.goal_cell = -1
+        if len(base_goals):
+            x, y = divmod(int(base_goals[-1]), self._w)
+            self.goal_cell = (1 + (repeat_y - 1) * self._h + x) * self.width + 1 + (repeat_x - 1) * self._w + y
+
+        self._bind_views()
+
+        self.tiles = TiledArray((self.n_cells,), np.uint8, self._tile, self._tiles)
+        self.abstract_tiles = None
+        if base_world.abstract_tiles is not None:
+            self.abstract_tiles = TiledArray((self.n_cells,), np.uint8, self._abstract_tile, self._abstract_tiles)
+        self.flags = TiledArray((self.n_cells,), np.uint8, self._flag, self._flags)
+        self.rewards = TiledArray((self.n_cells,), base_world.rewards.dtype, self._reward, self._rewards)
+        self.rule_index = TiledArray((self.n_cells,), np.int16, self._rule, self._rules)
+        self.next_cell = TiledArray((self.n_cells, 4), np.int32, self._next, self._nexts)
+
+    # Memoryviews for scalar lookups; they cannot be pickled and are bound again on unpickling
+    _VIEWS = ('_base_tiles', '_base_abstract_tiles', '_base_flags', '_base_rewards', '_base_rule_index')
+
+    def _bind_views(self):
+        for name in self._VIEWS:
+            array = getattr(self.base_world, name[len('_base_'):])
+            setattr(self, name, memoryview(array) if array is not None else None)
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k not in self._VIEWS}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind_views()
+
+    def _base_cell(self, cell):
+        # Cell of the base world that a cell repeats, -1 for the border
+        x, y = divmod(cell, self.width)
+        if 0 < x < self.height - 1 and 0 < y < self.width - 1:
+            return (1 + (x - 1) % self._h) * self._base_width + 1 + (y - 1) % self._w
+        return -1
+
+    def _base_cells(self, cells):
+        x, y = np.divmod(cells, self.width)
+        inside = (x > 0) & (x < self.height - 1) & (y > 0) & (y < self.width - 1)
+        return np.where(inside, (1 + (x - 1) % self._h) * self._base_width + 1 + (y - 1) % self._w, -1)
+
+    @staticmethod
+    def _lookup(base_array, base_cells, fill):
+        return np.where(base_cells >= 0, base_array[np.maximum(base_cells, 0)], fill)
+
+    def _tile(self, cell):
+        base = self._base_cell(cell)
+        if base < 0:
+            return _WALL_TILE
+        tile = self._base_tiles[base]
+        return _EMPTY_TILE if tile == _GOAL_TILE and cell != self.goal_cell else tile
+
+    def _tiles(self, cells):
+        tiles = self._lookup(self.base_world.tiles, self._base_cells(cells), _WALL_TILE)
+        return np.where((tiles == _GOAL_TILE) & (cells != self.goal_cell), _EMPTY_TILE, tiles)
+
+    def _abstract_tile(self, cell):
+        base = self._base_cell(cell)
+        return self._base_abstract_tiles[base] if base >= 0 else _WALL_TILE
+
+    def _abstract_tiles(self, cells):
+        return self._lookup(self.base_world.abstract_tiles, self._base_cells(cells), _WALL_TILE)
+
+    def _flag(self, cell):
+        base = self._base_cell(cell)
+        if base < 0:
+            return WALL
+        flags = self._base_flags[base]
+        return flags & ~GOAL if flags & GOAL and cell != self.goal_cell else flags
+
+    def _flags(self, cells):
+        flags = self._lookup(self.base_world.flags, self._base_cells(cells), WALL)
+        return np.where(cells != self.goal_cell, flags & (0xFF ^ GOAL), flags)
+
+    def _reward(self, cell):
+        base = self._base_cell(cell)
+        return self._base_rewards[base] if base >= 0 else 0
+
+    def _rewards(self, cells):
+        return self._lookup(self.base_world.rewards, self._base_cells(cells), 0)
+
+    def _rule(self, cell):
+        base = self._base_cell(cell)
+        return self._base_rule_index[base] if base >= 0 else -1
+
+    def _rules(self, cells):
+        return self._lookup(self.base_world.rule_index, self._base_cells(cells), -1)
+
+    def _cell_at(self, x, y):
+        return x * self.width + y if 0 <= x < self.height and 0 <= y < self.width else -1
+
+    def _next(self, index):
+        # Same rules as CompiledWorld.next_cell: walls block, doors are passed through
+        cell, action = divmod(index, 4)
+        x, y = divmod(cell, self.width)
+        dx, dy = ACTION_DELTAS[action]
+        target = self._cell_at(x + dx, y + dy)
+        if target < 0:
+            return -1
+        tile = self._tile(target)
+        if tile == _WALL_TILE:
+            return -1
+        return self._cell_at(x + 2 * dx, y + 2 * dy) if tile == _DOOR_TILE else target
+
+    def _nexts(self, indices):
+        cells, actions = np.divmod(indices, 4)
+        x, y = np.divmod(cells, self.width)
+        dx, dy = np.array(ACTION_DELTAS).T[:, actions]
+        target = self._shift(x + dx, y + dy)
+        tiles = np.where(target >= 0, self._tiles(np.maximum(target, 0)), _WALL_TILE)
+        beyond_door = self._shift(x + 2 * dx, y + 2 * dy)
+        return np.where(tiles == _WALL_TILE, -1, np.where(tiles == _DOOR_TILE, beyond_door, target))
+
+    def _rows(self, tiles):
+        return super()._rows(np.asarray(tiles))
+
+
+class TiledObservationEncoder(ObservationEncoder):
+    """
+    ObservationEncoder of a TiledWorld, with the same observation ids as the encoder of the expanded world.
+    Base ids are ranks in row-major order, so they are computed from per-row counts of coordinate observations in
+    the base world instead of being stored per cell.
+    """
+
+    def __init__(self, tiled_world, is_partially_obs=True, indicate_wall=False):
+        self.width = tiled_world.width
+        self.is_partially_obs = is_partially_obs
+        self.has_slips = bool(tiled_world.rule_ids)
+        self.indicate_wall = indicate_wall
+        self._tiled_world = tiled_world
+        self._h, self._w = tiled_world._h, tiled_world._w
+
+        base_world = tiled_world.base_world
+        symbol_name_index = self._name_index(base_world)
+        tiles = base_world.abstract_tiles if is_partially_obs else base_world.tiles
+        tiles = np.asarray(tiles).reshape(base_world.height, base_world.width)[1:-1, 1:-1]
+
+        observable = ~np.isin(tiles, [ord('#'), ord('D'), ord('E')])
+        coordinates = observable & np.isin(tiles, [ord(' '), ord('G')]) if is_partially_obs else observable
+        cell_names = np.where(observable & ~coordinates, symbol_name_index[tiles], -1)
+
+        # Number of coordinate observations in a row of the base interior, before a column, and before a row of
+        # a block of repeats
+        row_counts = coordinates.sum(axis=1)
+        self._row_counts = row_counts.tolist()
+        self._column_offsets = np.cumsum(coordinates, axis=1) - coordinates
+        self._row_offsets = np.concatenate([[0], np.cumsum(row_counts)]) * tiled_world.repeat_x
+        self._block_count = int(self._row_offsets[-1])
+        self._coordinate_columns = [np.flatnonzero(row).tolist() for row in coordinates]
+        self._coordinates, self._cell_names = coordinates, cell_names
+        self._n_coordinates = self._block_count * tiled_world.repeat_y
+
+        # The first cell of every name is in the first repeat; each of them introduces a base id
+        first_cells = dict()
+        for x, y in zip(*np.nonzero(cell_names >= 0)):
+            first_cells.setdefault(int(cell_names[x, y]), (1 + int(x)) * self.width + 1 + int(y))
+        self._name_cells = sorted(first_cells.values())
+        # Base id of every name; the extra last entry is the base id (-1) of cells without a name
+        self._name_base = np.full(len(self.names) + 1, -1, dtype=np.int64)
+        for name, cell in first_cells.items():
+            x, y = divmod(cell, self.width)
+            self._name_base[name] = self._rank(x, y) + self._name_cells.index(cell)
+        self._base_names = {int(base): name for name, base in enumerate(self._name_base) if base >= 0}
+        self._name_base_ids = sorted(self._base_names)
+
+        self.cell_base = TiledArray((tiled_world.n_cells,), np.int32, self._cell_base, self._cell_bases)
+        self.base_cells = TiledArray((self._n_coordinates + len(self._base_names),), np.int64, self._base_cell,
+                                     np.vectorize(self._base_cell, otypes=[np.int64]))
+        self._set_sizes()
+
+    def _set_sizes(self):
+        self.name_base = {self.names[name]: base for base, name in self._base_names.items()}
+        self.n_base = self._n_coordinates + len(self._base_names)
+        self.n_plain = self.n_base * 5 if self.has_slips else self.n_base
+        self.n_observations = self.n_plain * 2 if self.indicate_wall else self.n_plain
+
+    def _rank(self, x, y):
+        # Number of coordinate observations before the interior cell (x, y) in row-major order
+        block_row, row = divmod(x - 1, self._h)
+        block_column, column = divmod(y - 1, self._w)
+        return int(block_row * self._block_count + self._row_offsets[row] + block_column * self._row_counts[row]
+                   + self._column_offsets[row, column])
+
+    def _cell_base(self, cell):
+        x, y = divmod(cell, self.width)
+        if not (0 < x < self._tiled_world.height - 1 and 0 < y < self.width - 1):
+            return -1
+        row, column = (x - 1) % self._h, (y - 1) % self._w
+        if self._coordinates[row, column]:
+            return self._rank(x, y) + bisect_left(self._name_cells, cell)
+        return int(self._name_base[self._cell_names[row, column]])
+
+    def _cell_bases(self, cells):
+        x, y = np.divmod(cells, self.width)
+        inside = (x > 0) & (x < self._tiled_world.height - 1) & (y > 0) & (y < self.width - 1)
+        block_row, row = np.divmod(np.maximum(x - 1, 0), self._h)
+        block_column, column = np.divmod(np.maximum(y - 1, 0), self._w)
+        ranks = (block_row * self._block_count + self._row_offsets[row]
+                 + block_column * np.asarray(self._row_counts)[row] + self._column_offsets[row, column])
+        coordinate_bases = ranks + np.searchsorted(self._name_cells, cells)
+        name_bases = self._name_base[self._cell_names[row, column]]
+        return np.where(inside, np.where(self._coordinates[row, column], coordinate_bases, name_bases), -1)
+
+    def _base_cell(self, base):
+        # Inverse of cell_base: cell of a coordinate base id, -1 - name index for abstract ones
+        name = self._base_names.get(base)
+        if name is not None:
+            return -1 - name
+        rank = base - bisect_left(self._name_base_ids, base)
+        block_row, rank = divmod(rank, self._block_count)
+        row = bisect_right(self._row_offsets, rank) - 1
+        block_column, index = divmod(rank - int(self._row_offsets[row]), self._row_counts[row])
+        column = self._coordinate_columns[row][index]
+        return (1 + block_row * self._h + row) * self.width + 1 + block_column * self._w + column
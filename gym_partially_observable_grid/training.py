@@ -0,0 +1,125 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from gym_partially_observable_grid.rng import generator
+
+TrainingStats = namedtuple('TrainingStats', ['episodes', 'steps', 'seconds', 'episodes_per_sec', 'mean_return'])
+EvaluationStats = namedtuple('EvaluationStats', ['episodes', 'goals_reached', 'mean_episode_length', 'mean_return'])
+
+
+# Decay schedules map the number of finished training episodes to a hyperparameter value
+def linear_decay(start, end, episodes):
+    def schedule(episode):
+        return start + (end - start) * min(episode / episodes, 1)
+    return schedule
+
+
+def exponential_decay(start, rate, minimum=0):
+    def schedule(episode):
+        return max(start * rate ** episode, minimum)
+    return schedule
+
+
+def _value(hyperparameter, episode):
+    # Hyperparameters are constants or schedules
+    return hyperparameter(episode) if callable(hyperparameter) else hyperparameter
+
+
+class QLearningTrainer:
+    """
+    Tabular Q-learning on all lanes of a VectorPartiallyObservableWorld at once: actions of the batch are chosen
+    epsilon-greedily and the Q-table is updated for the batch with fancy indexing. alpha, gamma and epsilon are
+    constants or schedules (see linear_decay and exponential_decay) of the number of finished episodes.
+    If several lanes update the same (observation, action) pair in one step, the pair moves by the mean of their
+    updates, each computed from the value before the step, so duplicates do not enlarge the step size.
+    """
+
+    def __init__(self, env, alpha=0.1, gamma=0.6, epsilon=0.1, seed=None):
+        self.env = env
+        self.alpha, self.gamma, self.epsilon = alpha, gamma, epsilon
+        self.q_table = np.zeros((env.encoder.n_observations, 4))
+        self.rng = generator(seed)
+        self.episodes = 0
+
+    def _actions(self, observations, epsilon):
+        actions = self.q_table[observations].argmax(axis=1)
+        if epsilon > 0:
+            explore = self.rng.random(self.env.num_envs) < epsilon
+            actions[explore] = self.rng.integers(0, 4, explore.sum())
+        return actions
+
+    def train(self, num_episodes, report_every=None):
+        """
+        Trains until num_episodes more episodes are finished (lanes finishing in the same last step are counted too)
+        and returns TrainingStats. If report_every is set, progress is printed about every report_every episodes.
+        """
+        env, q_table = self.env, self.q_table
+        target_episodes = self.episodes + num_episodes
+        next_report = self.episodes + report_every if report_every else None
+        returns = np.zeros(env.num_envs)
+        finished_returns, steps, episodes = 0.0, 0, 0
+
+        start = time.perf_counter()
+        observations = env.reset()
+        while self.episodes < target_episodes:
+            alpha, gamma = _value(self.alpha, self.episodes), _value(self.gamma, self.episodes)
+            actions = self._actions(observations, _value(self.epsilon, self.episodes))
+
+            next_observations, rewards, dones, info = env.step(actions)
+            # Finished episodes bootstrap from the observation that ended them, not from the reset one
+            last_observations = info.get('final_observation', next_observations)
+
+            old_values = q_table[observations, actions]
+            next_max = q_table[last_observations].max(axis=1)
+            updates = alpha * (rewards + gamma * next_max - old_values)
+            # Updates of lanes sharing a pair are averaged
+            pairs, lane_pairs, counts = np.unique(observations * 4 + actions, return_inverse=True, return_counts=True)
+            q_table.reshape(-1)[pairs] += np.bincount(lane_pairs, updates, len(pairs)) / counts
+
+            returns += rewards
+            n_done = int(dones.sum())
+            if n_done:
+                finished_returns += returns[dones].sum()
+                returns[dones] = 0
+                self.episodes += n_done
+                episodes += n_done
+            steps += env.num_envs
+            observations = next_observations
+
+            if next_report is not None and self.episodes >= next_report:
+                elapsed = time.perf_counter() - start
+                print(f'Episode: {self.episodes}, episodes/sec: {episodes / elapsed:.0f}')
+                next_report += report_every
+
+        seconds = time.perf_counter() - start
+        return TrainingStats(episodes, steps, seconds, episodes / seconds, float(finished_returns) / max(episodes, 1))
+
+    def evaluate(self, num_episodes=100):
+        """
+        Greedy rollouts in rounds: every round resets all lanes and counts the first episode of every lane, so short
+        episodes are not over-represented. The last round only counts the lanes with the lowest indices, so that
+        exactly num_episodes episodes are counted. Goals reached are episodes that ended by reaching the goal.
+        """
+        env = self.env
+        episodes, goals_reached, total_length, total_return = 0, 0, 0, 0.0
+
+        while episodes < num_episodes:
+            observations = env.reset()
+            # Lanes are chosen by index, not by when their episodes finish
+            running = np.arange(env.num_envs) < num_episodes - episodes
+            counted = int(running.sum())
+            lengths, returns = np.zeros(env.num_envs, dtype=np.int64), np.zeros(env.num_envs)
+            while running.any():
+                observations, rewards, dones, _ = env.step(self._actions(observations, 0))
+                lengths += running
+                returns += rewards * running
+                finished = running & dones
+                goals_reached += int((rewards[finished] == env.goal_reward).sum())
+                running &= ~dones
+            episodes += counted
+            total_length += int(lengths.sum())
+            total_return += returns.sum()
+
+        return EvaluationStats(episodes, goals_reached, total_length / episodes, float(total_return) / episodes)
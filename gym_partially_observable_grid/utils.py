@@ -1,48 +1,142 @@
+import os
+from bisect import bisect_right
 from collections import defaultdict
-from random import choices
+from functools import cached_property
+from itertools import accumulate
+from random import random
+
+import numpy as np
 
 # Available actions
 actions_dict = {'up': 0, 'down': 1, 'left': 2, 'right': 3}
 action_space_to_act_map = {i: k for k, i in actions_dict.items()}
 
 
+def _symbols(codes):
+    return [chr(code) for code in codes.tolist()]
+
+
+def _present_symbols(layout):
+    # Sorted codes of the symbols in a layout
+    return np.flatnonzero(np.bincount(layout.reshape(-1), minlength=256))
+
+
+def _rows(layout):
+    return [list(row.tobytes().decode('latin-1')) for row in layout]
+
+
 class StochasticTile:
     def __init__(self, rule_id):
         self.rule_id = rule_id
         self.behaviour = dict()
+        # Map of actions to (new actions, cumulative distribution), so that sampling needs a single uniform draw
+        self.samplers = dict()
 
     def add_stochastic_action(self, action, new_action_probabilities):
         self.behaviour[action] = new_action_probabilities
         assert round(sum([p[1] for p in new_action_probabilities]), 5) == 1.0
 
-    def get_action(self, action):
-        if action not in self.behaviour.keys():
-            return action
-        actions = [a[0] for a in self.behaviour[action]]
-        prob_dist = [a[1] for a in self.behaviour[action]]
+        cdf = list(accumulate(p[1] for p in new_action_probabilities))
+        # Guard against rounding errors, uniform draws are always below the last value
+        cdf[-1] = 1.0
+        self.samplers[action] = ([p[0] for p in new_action_probabilities], cdf)
 
-        new_action = choices(actions, prob_dist, k=1)[0]
+    def get_action(self, action, rng=None):
+        # rng is any object with a random() method, e.g. random.Random; the random module is used by default.
+        # Actions without a sampler are deterministic and draw nothing.
+        if action not in self.samplers:
+            return action
+        return self.sample_action(action, random() if rng is None else rng.random())
 
-        return new_action
+    def sample_action(self, action, uniform):
+        # Executed action for a uniform draw from [0, 1)
+        sampler = self.samplers.get(action)
+        if sampler is None:
+            return action
+        new_actions, cdf = sampler
+        return new_actions[bisect_right(cdf, uniform)]
 
     def get_all_actions(self):
         return list({action_prob_pair[0] for rule in self.behaviour.values() for action_prob_pair in rule})
 
 
+# Sections of world files. The first rows of every section are a map of the same size as the layout, the
+# remaining lines of a section are its definitions.
+SECTIONS = ('Layout', 'Abstraction', 'Behaviour', 'Rewards')
+_SECTION_NAMES = tuple(section.encode() for section in SECTIONS)
+# Tile used to pad map rows shorter than the layout
+_FILL = {'Layout': '#', 'Abstraction': '#', 'Behaviour': ' ', 'Rewards': ' '}
+
+
+class WorldFileError(ValueError):
+    def __init__(self, path, line_number, message):
+        super().__init__(f'{path}, line {line_number}: {message}')
+        self.path = path
+        self.line_number = line_number
+
+
+def open_world_file(path):
+    # World files compressed with gzip (.gz) or xz (.xz) are decompressed while reading
+    path = os.fspath(path)
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rb')
+    if path.endswith('.xz'):
+        import lzma
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class _MapRows:
+    # Rows of the map of a section, appended to one buffer, and the line number of every row
+    def __init__(self):
+        self.header_line = None
+        self.data = bytearray()
+        self.lengths = []
+        self.line_numbers = []
+
+    def add(self, row, line_number):
+        self.data += row
+        self.lengths.append(len(row))
+        self.line_numbers.append(line_number)
+
+    def array(self, height, width, fill):
+        if not self.lengths:
+            return None
+        if len(self.lengths) == height and all(length == width for length in self.lengths):
+            return np.frombuffer(self.data, dtype=np.uint8).reshape(height, width)
+        array = np.full((height, width), ord(fill), dtype=np.uint8)
+        buffer = np.frombuffer(self.data, dtype=np.uint8)
+        offset = 0
+        for x, length in enumerate(self.lengths):
+            array[x, :min(length, width)] = buffer[offset:offset + min(length, width)]
+            offset += length
+        return array
+
+
 class PartiallyObsGridworldParser:
+    """
+    Parser of world files. Layouts are stored as contiguous (height, width) uint8 arrays of tile symbols in
+    row-major order; rows shorter than the widest layout row are padded with walls in the layout and abstraction and
+    with spaces in the behaviour and reward layouts. List-of-lists views and the per-location dictionaries are only
+    created when accessed.
+    Files are read in a single pass, and may be compressed (.gz, .xz). Malformed files raise WorldFileError with the
+    number of the offending line.
+    """
+
     def __init__(self, path_to_file):
+        # Definition lines of every section
         self.content = defaultdict(list)
 
         # State space
         self.state_space = 0
-        # Representation of concrete ((x,y) coordinates) world and abstract world
-        self.world, self.abstract_world = None, None
+        # Size of the layout
+        self.height, self.width = 0, 0
+        # Tile symbols of the concrete ((x,y) coordinates) world, abstract world and rules and rewards layouts;
+        # all but layout are None if their section is not defined
+        self.layout, self.abstract_layout, self.behaviour_layout, self.rewards_layout = None, None, None, None
         # Map of stochastic tiles, where each tile is identified by rule_id
         self.rules = dict()
-        # Map of locations to rule_ids, that is, tile has stochastic behaviour
-        self.stochastic_tile = dict()
-        # Map of locations that return a reward
-        self.reward_tiles = dict()
         # Map of symbols to rewards
         self.symbol_reward_map = dict()
         # Map of abstract symbols to their names (if any)
@@ -51,110 +145,176 @@ class PartiallyObsGridworldParser:
         # Variables
         self.initial_location = None
         self.player_location = None
-        self.goal_location = set()
-        self.terminal_locations = set()
-        self.behavioral_toggles = set()
 
+        self.path = path_to_file
         self._parse_file(path_to_file)
-        self._parse_world_and_abstract_world()
         self._parse_abstraction_mappings()
         self._parse_layout_variables()
         self._parse_rewards()
-        self._parse_rules()
+        # Line numbers of map rows are only needed for errors
+        del self._map_rows
 
     def _parse_file(self, path_to_file):
-        file = open(path_to_file, 'r')
+        self._map_rows = {section: _MapRows() for section in SECTIONS}
+        # Lines of sections that precede the end of the layout; until then it is unknown which of them are map rows
+        pending = []
         current_section = None
-        sections = ['Layout', 'Abstraction', 'Behaviour', 'Rewards']
-        for line in file.readlines():
-            line = line.strip()
-            if not line or line.startswith('//'):
-                continue
-            is_header = False
-            for section_name in sections:
-                if section_name in line:
-                    current_section = section_name
-                    is_header = True
-            if is_header:
-                continue
-
-            self.content[current_section].append(line)
-
-    def _parse_world_and_abstract_world(self):
-        self.world = [list(l.strip()) for l in self.content['Layout']]
-        self.abstract_world = [list(l.strip()) for l in self.content['Abstraction'][:len(self.world)]]
-        if not self.content['Abstraction']:
-            self.abstract_world = None
-        else:
-            assert len(self.world) == len(self.abstract_world)
+        height = None
 
-    def _parse_abstraction_mappings(self):
-        abstract_tiles = set()
-        for i, line in enumerate(self.content['Abstraction']):
-            if i <= len(self.world) - 1:
-                for abstract_tile in list(line):
-                    if abstract_tile not in {'#', 'D', 'G', 'E', ' '}:
-                        abstract_tiles.add(abstract_tile)
-
-            # add custom names
-            else:
-                id_name_pair = line.split(':')
+        with open_world_file(path_to_file) as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line or line.startswith(b'//'):
+                    continue
+                # Any line that mentions a section name starts that section
+                names = [section for section, name in zip(SECTIONS, _SECTION_NAMES) if name in line]
+                if names:
+                    current_section = names[-1]
+                    if current_section == 'Layout' and height is not None:
+                        raise WorldFileError(path_to_file, line_number, 'Layout section is defined twice')
+                    if current_section != 'Layout' and height is None and self._map_rows['Layout'].lengths:
+                        height = len(self._map_rows['Layout'].lengths)
+                    self._map_rows[current_section].header_line = line_number
+                    continue
+                if current_section is None:
+                    continue
+
+                if height is None and current_section != 'Layout':
+                    pending.append((current_section, line_number, line))
+                else:
+                    self._add_line(current_section, line_number, line, height)
+
+        self.height = len(self._map_rows['Layout'].lengths)
+        for section, line_number, line in pending:
+            self._add_line(section, line_number, line, self.height)
+
+        for section in SECTIONS[1:]:
+            map_rows = self._map_rows[section]
+            if 0 < len(map_rows.lengths) < self.height:
+                raise WorldFileError(path_to_file, map_rows.header_line,
+                                     f'{section} section has {len(map_rows.lengths)} rows, the layout has '
+                                     f'{self.height}')
+
+        self.width = max(self._map_rows['Layout'].lengths, default=0)
+        self.layout, self.abstract_layout, self.behaviour_layout, self.rewards_layout = [
+            self._map_rows[section].array(self.height, self.width, _FILL[section]) for section in SECTIONS]
+        if self.layout is None:
+            self.layout = np.zeros((0, 0), dtype=np.uint8)
+
+    def _add_line(self, section, line_number, line, height):
+        # The first height lines of a section are map rows, the following ones definitions
+        map_rows = self._map_rows[section]
+        if section == 'Layout' or len(map_rows.lengths) < height:
+            layout_length = self._map_rows['Layout'].lengths[len(map_rows.lengths)] if section != 'Layout' else None
+            if layout_length is not None and len(line) != layout_length:
+                raise WorldFileError(self.path, line_number, f'{section} row has {len(line)} tiles, the layout row '
+                                                             f'has {layout_length}')
+            map_rows.add(line, line_number)
+            return
+
+        definition = line.decode()
+        self.content[section].append(definition)
+        try:
+            if section == 'Abstraction':
+                id_name_pair = definition.split(':')
                 id, name = id_name_pair[0], id_name_pair[1]
                 self.abstract_symbol_name_map[id] = name
+            elif section == 'Rewards':
+                symbol_value_pair = definition.split(':')
+                symbol, value = symbol_value_pair[0], symbol_value_pair[1]
+                self.symbol_reward_map[symbol] = int(value)
+            else:
+                self._parse_and_process_rule(definition)
+        except (IndexError, KeyError, ValueError, AssertionError) as e:
+            raise WorldFileError(self.path, line_number, f'Malformed {section} definition {definition!r}') from e
 
+    def _parse_abstraction_mappings(self):
+        if self.abstract_layout is None:
+            return
         # if some abstract tile does not have defined name, it will just be itself :)
-        for at in list(abstract_tiles):
-            if at not in self.abstract_symbol_name_map.keys():
+        for at in _symbols(_present_symbols(self.abstract_layout)):
+            if at not in {'#', 'D', 'G', 'E', ' '} and at not in self.abstract_symbol_name_map.keys():
                 self.abstract_symbol_name_map[at] = at
 
     def _parse_layout_variables(self):
-        for x, line in enumerate(self.content['Layout']):
-            for y, tile in enumerate(line):
-                if tile == 'E':
-                    self.player_location = (x, y)
-                    self.initial_location = (x, y)
-                    self.world[self.player_location[0]][self.player_location[1]] = ' '
-                if tile == 'G':
-                    self.goal_location.add((x, y))
-                if tile == 'T':
-                    self.terminal_locations.add((x, y))
-                if tile == '@':
-                    self.behavioral_toggles.add((x, y))
-                if tile != '#' and tile != 'D':
-                    self.state_space += 1
+        players = np.flatnonzero(self.layout == ord('E'))
+        if len(players):
+            self.player_location = self.location(int(players[-1]))
+            self.initial_location = self.player_location
+            # Initial location is an empty tile
+            if not self.layout.flags.writeable:
+                self.layout = self.layout.copy()
+            self.layout[self.layout == ord('E')] = ord(' ')
+        self.state_space = int(np.count_nonzero((self.layout != ord('#')) & (self.layout != ord('D'))))
 
         assert self.player_location and self.goal_location
 
     def _parse_rewards(self):
-        for x, line in enumerate(self.content['Rewards']):
-            if x <= len(self.world) - 1:
-                for y, tile in enumerate(line):
-                    if tile not in {'#', 'D', 'G', ' '}:
-                        self.reward_tiles[(x, y)] = tile
-            else:
-                symbol_value_pair = line.split(':')
-                symbol, value = symbol_value_pair[0], symbol_value_pair[1]
-                self.symbol_reward_map[symbol] = int(value)
-
-        for k, v in self.reward_tiles.items():
-            self.reward_tiles[k] = self.symbol_reward_map[v]
-
-    def _parse_rules(self):
-
-        # Extract the rules layout
-        rule_world = []
-        for index, line in enumerate(self.content['Behaviour']):
-            # First part of the rules section corresponds to a map
-            if index <= len(self.world) - 1:
-                rule_world.append(line)
-            else:
-                self._parse_and_process_rule(line)
-
-        for x, line in enumerate(rule_world):
-            for y, tile in enumerate(line):
-                if tile in self.rules.keys():
-                    tile_xy = (x, y)
-                    self.stochastic_tile[tile_xy] = tile
+        if self.rewards_layout is not None:
+            for symbol in _symbols(_present_symbols(self.rewards_layout)):
+                if symbol not in {'#', 'D', 'G', ' '} and symbol not in self.symbol_reward_map:
+                    row = int(np.flatnonzero((self.rewards_layout == ord(symbol)).any(axis=1))[0])
+                    raise WorldFileError(self.path, self._map_rows['Rewards'].line_numbers[row],
+                                         f'Reward symbol {symbol!r} is not defined')
+
+    # Row-major indexing helpers; cell (x, y) has the id x * width + y
+
+    def cell(self, location):
+        return location[0] * self.width + location[1]
+
+    def location(self, cell):
+        return divmod(cell, self.width)
+
+    def tile(self, location):
+        return chr(self.layout[location])
+
+    def abstract_tile(self, location):
+        return chr(self.abstract_layout[location])
+
+    def _locations(self, mask):
+        return {self.location(cell) for cell in np.flatnonzero(mask).tolist()}
+
+    # Compatibility views of the layouts. They are created on first access, changes to them do not affect the
+    # layout arrays.
+
+    @cached_property
+    def world(self):
+        return _rows(self.layout)
+
+    @cached_property
+    def abstract_world(self):
+        return _rows(self.abstract_layout) if self.abstract_layout is not None else None
+
+    # Map of locations to rule_ids, that is, tile has stochastic behaviour
+    @cached_property
+    def stochastic_tile(self):
+        if self.behaviour_layout is None:
+            return dict()
+        rule_ids = [rule_id for rule_id in self.rules.keys() if len(rule_id) == 1]
+        cells = np.flatnonzero(np.isin(self.behaviour_layout, [ord(rule_id) for rule_id in rule_ids]))
+        return {self.location(cell): chr(symbol) for cell, symbol in
+                zip(cells.tolist(), self.behaviour_layout.reshape(-1)[cells].tolist())}
+
+    # Map of locations that return a reward
+    @cached_property
+    def reward_tiles(self):
+        if self.rewards_layout is None:
+            return dict()
+        cells = np.flatnonzero(~np.isin(self.rewards_layout, [ord(tile) for tile in '#DG ']))
+        return {self.location(cell): self.symbol_reward_map[chr(symbol)] for cell, symbol in
+                zip(cells.tolist(), self.rewards_layout.reshape(-1)[cells].tolist())}
+
+    @cached_property
+    def goal_location(self):
+        return self._locations(self.layout == ord('G'))
+
+    @cached_property
+    def terminal_locations(self):
+        return self._locations(self.layout == ord('T'))
+
+    @cached_property
+    def behavioral_toggles(self):
+        return self._locations(self.layout == ord('@'))
 
     def _parse_and_process_rule(self, rule):
         actions_dict = {'up': 0, 'down': 1, 'left': 2, 'right': 3}
@@ -178,61 +338,7 @@ class PartiallyObsGridworldParser:
 
         self.rules[rule_id].add_stochastic_action(rule_action, action_prob_pairs)
 
-    def _move(self, x, y, action):
-        if action == 'up':  # up
-            return x - 1, y
-        if action == 'down':  # down
-            return x + 1, y
-        if action == 'left':  # left
-            return x, y - 1
-        if action == 'right':  # right
-            return x, y + 1
-
-    def to_mdp(self):
-        from aalpy.automata import Mdp, MdpState
-
-        coordinates_to_state_map = dict()
-        for x, line in enumerate(self.world):
-            for y, tile in enumerate(line):
-                if tile in {'#', 'D'}:
-                    continue
-                abstract_tile = self.abstract_world[x][y]
-                if abstract_tile != ' ':
-                    output = self.abstract_symbol_name_map[abstract_tile]
-                else:
-                    output = (x, y)
-                coordinates_to_state_map[(x, y)] = MdpState(f's{len(coordinates_to_state_map.keys())}', output)
-
-        for x, line in enumerate(self.world):
-            print(line)
-            for y, tile in enumerate(line):
-                if tile in {'#', 'D'}:
-                    continue
-
-                for action in ['up', 'down', 'left', 'right']:
-                    if (x, y) in self.stochastic_tile.keys():
-                        rule = self.rules[self.stochastic_tile[(x, y)]]
-                        if actions_dict[action] in rule.keys():
-                            for new_action, probability in rule[action]:
-                                new_action = action_space_to_act_map[new_action]
-                                reached_state = self._move(x, y, new_action)
-                                if self.world[reached_state] == 'D':
-                                    reached_state = self._move(x, y, new_action)
-                                coordinates_to_state_map[(x, y)].transitions[action].append(
-                                    coordinates_to_state_map[reached_state], probability)
-                        else:
-                            reached_state = self._move(x, y, action)
-                            if self.world[reached_state] == 'D':
-                                reached_state = self._move(x, y, action)
-                            coordinates_to_state_map[(x, y)].transitions[action].append(
-                                coordinates_to_state_map[reached_state], 1.)
-                    else:
-                        reached_state = self._move(x, y, action)
-                        if self.world[reached_state] == 'D':
-                            reached_state = self._move(x, y, action)
-                        coordinates_to_state_map[(x, y)].transitions[action].append(
-                            coordinates_to_state_map[reached_state], 1.)
-
-        initial_state = coordinates_to_state_map[self.initial_location]
-
-        return Mdp(initial_state, list(coordinates_to_state_map.values()))
+    def to_mdp(self, is_partially_obs=True, force_determinism=False):
+        # aalpy Mdp of the world, see export.to_mdp; requires aalpy
+        from gym_partially_observable_grid.export import to_mdp
+        return to_mdp(self, is_partially_obs, force_determinism)
@@ -1,8 +1,5 @@
-import random
-
-import gym
-import gym_partially_observable_grid
-import numpy as np
+from gym_partially_observable_grid.envs import VectorPartiallyObservableWorld
+from gym_partially_observable_grid.training import QLearningTrainer, linear_decay
 
 # Make environment deterministic even if it is stochastic
 force_determinism = False
@@ -15,77 +12,33 @@ is_partially_obs = False
 # Otherwise, reward will be given every time
 one_time_rewards = True
 
-env = gym.make(id='poge-v1',
-               world_file_path='worlds/world0.txt',
-               force_determinism=force_determinism,
-               indicate_slip=indicate_slip,
-               indicate_wall=True,
-               is_partially_obs=is_partially_obs,
-               one_time_rewards=one_time_rewards,
-               step_penalty=-0.1)
+# Batch of environments that are trained together
+env = VectorPartiallyObservableWorld(world_file_path='worlds/world0.txt',
+                                     num_envs=64,
+                                     force_determinism=force_determinism,
+                                     indicate_slip=indicate_slip,
+                                     indicate_wall=True,
+                                     is_partially_obs=is_partially_obs,
+                                     one_time_rewards=one_time_rewards,
+                                     step_penalty=-0.1,
+                                     seed=0)
 
-q_table = np.zeros([env.observation_space.n, env.action_space.n])
+num_training_episodes = 10000
 
-# Hyper parameters
+# Hyper parameters; each of them can also be a schedule of the number of finished episodes
 alpha = 0.1
 gamma = 0.6
-epsilon = 0.1
-
-num_training_episodes = 10000
-
-# For plotting metrics
-all_epochs = []
-
-for i in range(1, num_training_episodes + 1):
-    state = env.reset()
-
-    epochs, penalties, reward, = 0, 0, 0
-    done = False
-    while not done:
-
-        action = env.action_space.sample() if random.random() < epsilon else np.argmax(q_table[state])
-
-        next_state, reward, done, info = env.step(action)
-
-        old_value = q_table[state, action]
+epsilon = linear_decay(0.3, 0.05, num_training_episodes)
 
-        next_max = np.max(q_table[next_state])
-
-        new_value = (1 - alpha) * old_value + alpha * (reward + gamma * next_max)
-        q_table[state, action] = new_value
-
-        if reward == -1:
-            penalties += 1
-
-        state = next_state
-        epochs += 1
-
-    if i % 100 == 0:
-        print(f"Episode: {i}")
+trainer = QLearningTrainer(env, alpha=alpha, gamma=gamma, epsilon=epsilon, seed=0)
+stats = trainer.train(num_training_episodes, report_every=1000)
 
 print("Training finished.\n")
+print(f"Trained on {stats.episodes} episodes ({stats.episodes_per_sec:.0f} episodes/sec)")
 
-total_epochs = 0
 episodes = 100
-
-goals_reached = 0
-for _ in range(episodes):
-    state = env.reset()
-    epochs, penalties, reward = 0, 0, 0
-
-    done = False
-
-    while not done:
-        action = np.argmax(q_table[state])
-        state, reward, done, info = env.step(action)
-
-        if reward == env.goal_reward and done:
-            goals_reached += 1
-
-        epochs += 1
-
-    total_epochs += epochs
+results = trainer.evaluate(episodes)
 
 print(f"Results after {episodes} episodes:")
-print(f"Total Number of Goal reached: {goals_reached}")
-print(f"Average timesteps per episode: {total_epochs / episodes}")
+print(f"Total Number of Goal reached: {results.goals_reached}")
+print(f"Average timesteps per episode: {results.mean_episode_length}")
@@ -0,0 +1,183 @@
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from gym_partially_observable_grid.cache import DEFAULT_CACHE_DIR, load_world
+from gym_partially_observable_grid.envs import VectorPartiallyObservableWorld
+from gym_partially_observable_grid.training import QLearningTrainer
+
+# Trial parameters passed to QLearningTrainer; all other parameters are options of the environment
+TRAINER_PARAMETERS = ('alpha', 'gamma', 'epsilon')
+
+# Defaults of sweep specifications
+DEFAULT_SPEC = {
+    'worlds': ['worlds/*.txt'],
+    'episodes': 10000,
+    'eval_episodes': 100,
+    'num_envs': 64,
+    'repeats': 1,
+    'seed': 0,
+}
+
+EXAMPLE_SPEC = '''{
+  "worlds": ["worlds/*.txt"],
+  "episodes": 10000,
+  "grid": {"alpha": [0.1, 0.5], "gamma": [0.6, 0.9], "indicate_slip": [true, false]},
+  "random": {"epsilon": {"log_uniform": [0.01, 0.3]}, "step_penalty": {"uniform": [-1, 0]}},
+  "num_samples": 4
+}'''
+
+
+def _sample(distribution, rng):
+    # Lists are sampled uniformly, {"uniform": [low, high]} and {"log_uniform": [low, high]} from the given range
+    if isinstance(distribution, list):
+        return rng.choice(distribution)
+    if 'uniform' in distribution:
+        return rng.uniform(*distribution['uniform'])
+    if 'log_uniform' in distribution:
+        low, high = distribution['log_uniform']
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    raise ValueError(f'Unknown distribution: {distribution}')
+
+
+def trial_id(trial):
+    return hashlib.sha256(json.dumps(trial, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def expand_spec(spec):
+    """
+    Trials of a sweep specification: every world, every combination of the "grid" parameters and num_samples
+    samples of the "random" parameters, each run with repeats seeds. Random samples are drawn from a generator
+    seeded with the spec seed, so that the same spec always yields the same trials.
+    """
+    spec = {**DEFAULT_SPEC, **spec}
+    rng = random.Random(spec['seed'])
+    worlds = sorted({world for pattern in spec['worlds'] for world in glob.glob(pattern)})
+
+    grid = spec.get('grid', {})
+    grid_points = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    random_space = spec.get('random', {})
+    num_samples = spec.get('num_samples', 1) if random_space else 1
+
+    trials = []
+    for world in worlds:
+        for point in grid_points:
+            for _ in range(num_samples):
+                parameters = {**point, **{name: _sample(d, rng) for name, d in random_space.items()}}
+                for repeat in range(spec['repeats']):
+                    trials.append({'world': world, 'parameters': parameters, 'episodes': spec['episodes'],
+                                   'eval_episodes': spec['eval_episodes'], 'num_envs': spec['num_envs'],
+                                   'seed': spec['seed'] + repeat})
+    return trials
+
+
+def run_trial(arguments):
+    # A trial that raises is returned as a failed row with the error, so that the other trials of the sweep go on
+    trial, cache_dir = arguments
+    start = time.perf_counter()
+    try:
+        return _run_trial(trial, cache_dir, start)
+    except Exception as e:
+        return {'id': trial_id(trial), **trial, 'error': f'{type(e).__name__}: {e}',
+                'wall_time': time.perf_counter() - start}
+
+
+def _run_trial(trial, cache_dir, start):
+    trainer_parameters = {k: v for k, v in trial['parameters'].items() if k in TRAINER_PARAMETERS}
+    env_parameters = {k: v for k, v in trial['parameters'].items() if k not in TRAINER_PARAMETERS}
+
+    # The compiled world is memory-mapped from the cache, so trials share it read-only
+    env = VectorPartiallyObservableWorld(trial['world'], num_envs=trial['num_envs'], cache_dir=cache_dir,
+                                         seed=trial['seed'], **env_parameters)
+    trainer = QLearningTrainer(env, seed=trial['seed'], **trainer_parameters)
+    training = trainer.train(trial['episodes'])
+    evaluation = trainer.evaluate(trial['eval_episodes'])
+
+    return {
+        'id': trial_id(trial),
+        **trial,
+        'goals_reached': evaluation.goals_reached,
+        'average_timesteps': evaluation.mean_episode_length,
+        'mean_return': evaluation.mean_return,
+        'episodes_per_sec': training.episodes_per_sec,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def finished_trials(results_path):
+    # Ids of trials in an earlier results file; a line cut off by an interruption is ignored, and failed trials are
+    # run again
+    finished = set()
+    if os.path.exists(results_path):
+        with open(results_path) as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                    if 'error' not in result:
+                        finished.add(result['id'])
+                except (ValueError, KeyError):
+                    continue
+    return finished
+
+
+def run_sweep(spec, results_path, num_workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Runs all trials of spec that are not in results_path yet on a process pool, appending one JSON line per
+    finished trial to results_path. Trials that raise are appended with an "error" field and run again on resume.
+    """
+    trials = expand_spec(spec)
+    finished = finished_trials(results_path)
+    pending = [trial for trial in trials if trial_id(trial) not in finished]
+    print(f'{len(trials)} trials, {len(trials) - len(pending)} already finished')
+
+    # Compile every world configuration once, before workers load it from the cache
+    configurations = {(t['world'], t['parameters'].get('is_partially_obs', True),
+                       t['parameters'].get('indicate_wall', False)) for t in pending}
+    for world, is_partially_obs, indicate_wall in sorted(configurations):
+        try:
+            load_world(world, is_partially_obs, indicate_wall, cache_dir)
+        except Exception:
+            # The trials of this world fail in the workers and are recorded there
+            continue
+
+    with open(results_path, 'a+') as results, multiprocessing.Pool(num_workers) as pool:
+        # Finish a line that was cut off by an interruption, so that new results start on their own line
+        if results.tell() > 0:
+            results.seek(results.tell() - 1)
+            if results.read(1) != '\n':
+                results.write('\n')
+        for done, result in enumerate(pool.imap_unordered(run_trial, [(t, cache_dir) for t in pending]), 1):
+            results.write(json.dumps(result) + '\n')
+            results.flush()
+            if 'error' in result:
+                print(f"[{done}/{len(pending)}] {result['world']} {result['parameters']}: failed, {result['error']}")
+                continue
+            print(f"[{done}/{len(pending)}] {result['world']} {result['parameters']}: "
+                  f"{result['goals_reached']}/{result['eval_episodes']} goals, "
+                  f"{result['average_timesteps']:.1f} steps, {result['wall_time']:.1f} s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Sweep Q-learning hyperparameters and environment options.',
+                                         epilog=f'Example specification:\n{EXAMPLE_SPEC}',
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('spec', help='JSON sweep specification')
+    arg_parser.add_argument('--output', default='sweep_results.jsonl', help='Results file, appended to on resume')
+    arg_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    arg_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Compiled world cache')
+    args = arg_parser.parse_args()
+
+    with open(args.spec) as file:
+        spec = json.load(file)
+    run_sweep(spec, args.output, args.workers, args.cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from gym_partially_observable_grid.belief import BeliefFilter
+from gym_partially_observable_grid.engine import GridEngine
+from gym_partially_observable_grid.planning import AugmentedTransitionModel
+
+
+@pytest.mark.parametrize('world_file_path', ['worlds/world1.txt', 'worlds/world2.txt', 'worlds/world3.txt'])
+def test_true_cell_keeps_belief(world_file_path):
+    engine = GridEngine(world_file_path, indicate_slip=True, seed=0)
+    belief = BeliefFilter(engine)
+    if world_file_path == 'worlds/world3.txt':
+        # world3 has a behavioural toggle
+        assert isinstance(belief.model, AugmentedTransitionModel)
+
+    rng = np.random.default_rng(0)
+    engine.reset()
+    for action in rng.integers(0, 4, 3000).tolist():
+        observation, _, done, _ = engine.step(action)
+        assert not belief.step(action, observation).any()
+        assert belief.cell_probabilities()[engine.compiled_world.cell(engine.player_location)] > 0
+        if done:
+            engine.reset()
+            belief.reset()
@@ -0,0 +1,38 @@
+import tracemalloc
+
+import numpy as np
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+from world_scaler import parse_file, create_world
+
+
+def _scaled_parser(tmp_path, repeat):
+    path = tmp_path / 'scaled.txt'
+    create_world(str(path), parse_file('worlds/world1.txt'), repeat, repeat)
+    return PartiallyObsGridworldParser(str(path))
+
+
+def test_bytes_per_cell(tmp_path, monkeypatch):
+    parser = _scaled_parser(tmp_path, 60)
+    # Blocks much smaller than the world, as on worlds with millions of cells
+    monkeypatch.setattr('gym_partially_observable_grid.compiled._BLOCK_CELLS', 1 << 12)
+
+    tracemalloc.start()
+    world = CompiledWorld(parser)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # tiles, abstract tiles and flags (1 byte each), rewards and rule index (2), next cell (4 x 4)
+    arrays = sum(getattr(world, name).nbytes for name in CompiledWorld._ARRAYS if getattr(world, name) is not None)
+    assert world.rewards.dtype == np.int16
+    assert arrays / world.n_cells <= 23.5
+    assert retained / world.n_cells <= 24
+    assert peak / world.n_cells <= 32
+
+
+def test_next_cell_blocks_match(tmp_path, monkeypatch):
+    parser = _scaled_parser(tmp_path, 3)
+    world = CompiledWorld(parser)
+    monkeypatch.setattr('gym_partially_observable_grid.compiled._BLOCK_CELLS', 7)
+    assert np.array_equal(CompiledWorld(parser).next_cell, world.next_cell)
@@ -0,0 +1,44 @@
+import pytest
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.encoding import ObservationEncoder
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser, actions_dict
+
+
+def _string_keyed_map(parser, is_partially_obs, indicate_wall):
+    # Observation map as the environment used to build it, keyed by coordinates, names and suffixed strings
+    state_2_one_hot_map = {}
+    abstract_symbols = set()
+    world = parser.abstract_world if is_partially_obs else parser.world
+    for x, row in enumerate(world):
+        for y, tile in enumerate(row):
+            if tile in {'#', 'D', 'E'}:
+                continue
+            if is_partially_obs and tile not in {' ', 'G'}:
+                abstraction = parser.abstract_symbol_name_map[tile]
+                if abstraction not in abstract_symbols:
+                    abstract_symbols.add(abstraction)
+                    state_2_one_hot_map[abstraction] = len(state_2_one_hot_map)
+            else:
+                state_2_one_hot_map[(x, y)] = len(state_2_one_hot_map)
+
+    if parser.rules:
+        for state in list(state_2_one_hot_map):
+            for action in actions_dict:
+                state_2_one_hot_map[f'{state}_slip_{action}'] = len(state_2_one_hot_map)
+    if indicate_wall:
+        for output in list(state_2_one_hot_map):
+            state_2_one_hot_map[f'{output}_wall'] = len(state_2_one_hot_map)
+    return state_2_one_hot_map
+
+
+@pytest.mark.parametrize('indicate_wall', [False, True])
+@pytest.mark.parametrize('is_partially_obs', [False, True])
+@pytest.mark.parametrize('world_file_path', ['worlds/world0.txt', 'worlds/world1.txt', 'worlds/world2.txt',
+                                             'worlds/world3.txt'])
+def test_ids_match_string_keyed_map(world_file_path, is_partially_obs, indicate_wall):
+    parser = PartiallyObsGridworldParser(world_file_path)
+    encoder = ObservationEncoder(CompiledWorld(parser), is_partially_obs, indicate_wall)
+    expected = _string_keyed_map(parser, is_partially_obs, indicate_wall)
+    assert encoder.n_observations == len(expected)
+    assert encoder.state_2_one_hot_map() == expected
@@ -0,0 +1,47 @@
+import re
+
+from gym_partially_observable_grid.export import export_prism, label_name
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+
+WORLD = '''===Layout===
+
+#######
+#E    #
+#    G#
+#######
+
+===Abstraction===
+
+#######
+#aabbc#
+#aabbc#
+#######
+
+a:room 1
+b:room-1
+c:goal
+'''
+
+
+def _label_names(path):
+    with open(path) as file:
+        return re.findall(r'^label "([^"]*)"', file.read(), re.MULTILINE)
+
+
+def test_prism_labels_are_identifiers(tmp_path):
+    export_prism(PartiallyObsGridworldParser('worlds/world0.txt'), tmp_path / 'world0.prism')
+    labels = _label_names(tmp_path / 'world0.prism')
+    assert labels == ['goal', 'terminal', 'abs_2', 'abs_1', 'abs_3']
+    assert all(re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', label) for label in labels)
+
+
+def test_prism_label_collisions(tmp_path):
+    world_path = tmp_path / 'world.txt'
+    world_path.write_text(WORLD)
+    export_prism(PartiallyObsGridworldParser(str(world_path)), tmp_path / 'world.prism')
+    assert _label_names(tmp_path / 'world.prism') == ['goal', 'terminal', 'abs_room_1', 'abs_room_1_2', 'abs_goal']
+
+
+def test_label_name():
+    assert label_name('1', set()) == 'abs_1'
+    assert label_name('a b', {'abs_a_b', 'abs_a_b_2'}) == 'abs_a_b_3'
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.engine import GridEngine
+from gym_partially_observable_grid.planning import AugmentedTransitionModel, TransitionModel, expected_distance_field
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+
+
+@pytest.mark.parametrize('world_file_path', ['worlds/world1.txt', 'worlds/world2.txt', 'worlds/world3.txt'])
+def test_expected_distances_solve_bellman_equation(world_file_path):
+    world = CompiledWorld(PartiallyObsGridworldParser(world_file_path))
+    field = expected_distance_field(world)
+    model = TransitionModel(world)
+    distances = field.distances[model.state_cells]
+
+    # Every state that can move on takes one step plus the expected distance of its best action
+    moving = np.isfinite(distances) & ~model.terminal
+    q_values = 1 + model._backup(distances).reshape(4, model.n_states).T
+    np.testing.assert_allclose(distances[moving], q_values[moving].min(axis=1), atol=1e-6)
+    assert (distances >= world.distance_field.distances[model.state_cells]).all()
+
+
+def test_expected_distance_unreachable_for_sure():
+    # Two cells of world3 have a path to the goal, but every policy from them may slip away from it for good
+    world = CompiledWorld(PartiallyObsGridworldParser('worlds/world3.txt'))
+    shortest, expected = world.distance_field.distances, world.expected_distance_field.distances
+    assert ((shortest >= 0) & np.isinf(expected)).sum() == 2
+
+
+@pytest.mark.parametrize('force_determinism', [True, False])
+@pytest.mark.parametrize('world_file_path', ['worlds/world1.txt', 'worlds/world2.txt', 'worlds/world3.txt'])
+def test_augmented_model_contains_env_transitions(world_file_path, force_determinism):
+    engine = GridEngine(world_file_path, force_determinism=force_determinism, seed=0)
+    model = AugmentedTransitionModel(engine.compiled_world, force_determinism=force_determinism)
+    if force_determinism:
+        assert (model.prob == 1.).all()
+
+    def state():
+        return model.state_of(engine.player_location, engine.use_stochastic_tiles, engine.collected_rewards)
+
+    rng = np.random.default_rng(0)
+    engine.reset()
+    for action in rng.integers(0, 4, 3000).tolist():
+        source = state()
+        _, reward, done, _ = engine.step(action)
+        target = state()
+        row = action * model.n_states + source
+        entries = slice(model.indptr[row], model.indptr[row + 1])
+        assert target in model.next_state[entries]
+        assert reward in model.reward[entries][model.next_state[entries] == target]
+        if done:
+            engine.reset()
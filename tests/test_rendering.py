@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from gym_partially_observable_grid.engine import GridEngine
+
+
+def _frames(engine, **kwargs):
+    engine.reset()
+    frames = []
+    for action in (1, 2, 2, 0, 0):
+        engine.step(action)
+        frames.append(engine.render(mode='rgb_array', **kwargs))
+    return frames
+
+
+def test_rgb_frames_can_be_kept():
+    engine = GridEngine('worlds/world1.txt', force_determinism=True)
+    frames = _frames(engine)
+    assert len({frame.tobytes() for frame in frames}) == len(frames)
+    for frame, copy in zip(frames, _frames(engine)):
+        np.testing.assert_array_equal(frame, copy)
+
+
+def test_shared_rgb_frame():
+    engine = GridEngine('worlds/world1.txt', force_determinism=True)
+    frames = _frames(engine, shared_frame=True)
+    assert all(frame is frames[0] for frame in frames)
+    np.testing.assert_array_equal(frames[-1], engine.render(mode='rgb_array'))
+    with pytest.raises(ValueError):
+        frames[0][0, 0] = 0
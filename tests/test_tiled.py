@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from gym_partially_observable_grid.compiled import CompiledWorld
+from gym_partially_observable_grid.encoding import ObservationEncoder
+from gym_partially_observable_grid.engine import GridEngine
+from gym_partially_observable_grid.tiled import TiledWorld, TiledObservationEncoder
+from gym_partially_observable_grid.utils import PartiallyObsGridworldParser
+from world_scaler import parse_file, create_world
+
+WORLDS = ['worlds/world0.txt', 'worlds/world1.txt', 'worlds/world2.txt', 'worlds/world3.txt']
+
+
+def _expanded(tmp_path, world_file_path, repeat_x, repeat_y):
+    path = str(tmp_path / 'scaled.txt')
+    create_world(path, parse_file(world_file_path), repeat_x, repeat_y)
+    return path
+
+
+@pytest.mark.parametrize('repeat', [(1, 1), (3, 2), (2, 5)])
+@pytest.mark.parametrize('world_file_path', WORLDS)
+def test_tiled_world_equals_expanded_world(tmp_path, world_file_path, repeat):
+    full = CompiledWorld(PartiallyObsGridworldParser(_expanded(tmp_path, world_file_path, *repeat)))
+    tiled = TiledWorld(CompiledWorld(PartiallyObsGridworldParser(world_file_path)), *repeat)
+
+    assert (tiled.height, tiled.width, tiled.initial_cell) == (full.height, full.width, full.initial_cell)
+    for name in CompiledWorld._ARRAYS:
+        if getattr(full, name) is None:
+            assert getattr(tiled, name) is None
+        else:
+            np.testing.assert_array_equal(np.asarray(getattr(tiled, name)), getattr(full, name), err_msg=name)
+    assert tiled.world == full.world
+
+    for is_partially_obs in (True, False):
+        expected = ObservationEncoder(full, is_partially_obs, True)
+        encoder = TiledObservationEncoder(tiled, is_partially_obs, True)
+        np.testing.assert_array_equal(np.asarray(encoder.cell_base), expected.cell_base)
+        assert encoder.state_2_one_hot_map() == expected.state_2_one_hot_map()
+
+
+@pytest.mark.parametrize('options', [dict(), dict(indicate_slip=True, indicate_wall=True),
+                                     dict(is_partially_obs=False, force_determinism=True)])
+@pytest.mark.parametrize('world_file_path', WORLDS)
+def test_tiled_env_follows_expanded_env(tmp_path, world_file_path, options):
+    full = GridEngine(_expanded(tmp_path, world_file_path, 3, 2), seed=5, **options)
+    tiled = GridEngine(world_file_path, repeat=(3, 2), seed=5, **options)
+    full.reset(), tiled.reset()
+    for action in np.random.default_rng(5).integers(0, 4, 2000).tolist():
+        step = full.step(action)
+        assert tiled.step(action) == step
+        if step[2]:
+            assert tiled.reset() == full.reset()
@@ -0,0 +1,22 @@
+import numpy as np
+
+from gym_partially_observable_grid.envs.VectorPartiallyObsGridEnv import VectorPartiallyObservableWorld
+from gym_partially_observable_grid.training import QLearningTrainer
+
+
+def test_q_values_stay_bounded_with_many_lanes():
+    # Many lanes share few observations under abstraction, so most steps update some pair more than once
+    env = VectorPartiallyObservableWorld('worlds/world2.txt', num_envs=256, seed=0, is_partially_obs=True)
+    trainer = QLearningTrainer(env, alpha=0.3, gamma=0.9, seed=0)
+    trainer.train(2000)
+
+    largest_reward = max(env.goal_reward, int(np.abs(env.compiled_world.rewards).max()))
+    assert np.isfinite(trainer.q_table).all()
+    assert np.abs(trainer.q_table).max() <= largest_reward / (1 - 0.9)
+
+
+def test_evaluate_counts_requested_episodes():
+    env = VectorPartiallyObservableWorld('worlds/world1.txt', num_envs=8, seed=0)
+    stats = QLearningTrainer(env, seed=0).evaluate(13)
+    assert stats.episodes == 13
+    assert stats.goals_reached <= 13
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from gym_partially_observable_grid.envs import (PartiallyObservableWorld, VectorPartiallyObservableWorld,
+                                                SubprocPartiallyObservableWorld)
+from gym_partially_observable_grid.rng import lane_seeds
+
+NUM_ENVS, NUM_STEPS, SEED = 4, 500, 123
+OPTIONS = [dict(indicate_slip=True), dict(indicate_slip=True, indicate_wall=True, max_ep_len=40, step_penalty=1)]
+
+
+def _single_lanes(world_file_path, actions, options):
+    # Observations (after automatic resets), rewards, dones and final observations of one env per lane
+    lanes = []
+    for lane, seed in enumerate(lane_seeds(SEED, NUM_ENVS)):
+        env = PartiallyObservableWorld(world_file_path, seed=seed, **options)
+        env.reset()
+        steps = []
+        for action in actions[:, lane].tolist():
+            observation, reward, done, _ = env.step(action)
+            steps.append((env.reset() if done else observation, reward, done, observation))
+        lanes.append(steps)
+    return [np.array([[step[k] for step in steps] for steps in lanes]).T for k in range(4)]
+
+
+def _batched(env, actions):
+    env.reset()
+    steps = []
+    for batch in actions:
+        observations, rewards, dones, info = env.step(batch)
+        steps.append((observations, rewards, dones, info.get('final_observation', observations)))
+    return [np.array([step[k] for step in steps]) for k in range(4)]
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+@pytest.mark.parametrize('world_file_path', ['worlds/world1.txt', 'worlds/world3.txt'])
+def test_vector_lanes_match_single_envs(world_file_path, options):
+    actions = np.random.default_rng(0).integers(0, 4, (NUM_STEPS, NUM_ENVS))
+    expected = _single_lanes(world_file_path, actions, options)
+    batched = _batched(VectorPartiallyObservableWorld(world_file_path, num_envs=NUM_ENVS, seed=SEED, **options),
+                       actions)
+    for column, expected_column in zip(batched, expected):
+        np.testing.assert_array_equal(column, expected_column)
+
+
+@pytest.mark.parametrize('world_file_path', ['worlds/world1.txt', 'worlds/world3.txt'])
+def test_subproc_lanes_match_single_envs(world_file_path):
+    options = OPTIONS[1]
+    actions = np.random.default_rng(0).integers(0, 4, (NUM_STEPS, NUM_ENVS))
+    expected = _single_lanes(world_file_path, actions, options)
+    env = SubprocPartiallyObservableWorld(world_file_path, num_envs=NUM_ENVS, num_workers=2, seed=SEED, **options)
+    try:
+        batched = _batched(env, actions)
+    finally:
+        env.close()
+    for column, expected_column in zip(batched, expected):
+        np.testing.assert_array_equal(column, expected_column)
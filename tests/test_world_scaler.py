@@ -0,0 +1,17 @@
+import pathlib
+
+import pytest
+
+from world_scaler import parse_file, create_world
+
+# Scaled worlds written by the original scaler, which built the whole world in memory
+REFERENCE_DIR = pathlib.Path(__file__).parent / 'data'
+
+
+@pytest.mark.parametrize('repeat', [(1, 1), (3, 2)])
+@pytest.mark.parametrize('world', ['world0', 'world1', 'world2', 'world3'])
+def test_scaled_world_matches_reference(tmp_path, world, repeat):
+    repeat_x, repeat_y = repeat
+    path = tmp_path / 'scaled.txt'
+    create_world(str(path), parse_file(f'worlds/{world}.txt'), repeat_x, repeat_y)
+    assert path.read_bytes() == (REFERENCE_DIR / f'{world}_{repeat_x}x{repeat_y}.txt').read_bytes()
@@ -1,7 +1,6 @@
+import argparse
 from collections import defaultdict
 
-from gym_partially_observable_grid.envs import PartiallyObservableWorld
-
 
 def parse_file(path_to_file):
     content = defaultdict(list)
@@ -22,112 +21,99 @@ def parse_file(path_to_file):
 
         content[current_section].append(line)
 
-    layout = [list(line) for line in content['Layout']]
-    abstraction_layout = [list(line) for line in content['Abstraction']][:len(layout)]
-
-    abstraction_mappings = ''
-    for am in content['Abstraction'][len(layout):]:
-        abstraction_mappings += f'{am}\n'
+    # Rows of each layout without the surrounding walls, which are added again around the scaled world
+    height = len(content['Layout'])
+    layout, abstraction_layout, behaviour_layout, rewards_layout = [
+        [line[1:-1] for line in content[section][1:height - 1]]
+        for section in ['Layout', 'Abstraction', 'Behaviour', 'Rewards']]
 
-    behaviour_layout = [list(line) for line in content['Behaviour']][:len(layout)]
-    behaviour_mapping = ''
-    for rm in content['Behaviour'][len(layout):]:
-        behaviour_mapping += f'{rm}\n'
+    abstraction_mappings = ''.join(f'{am}\n' for am in content['Abstraction'][height:])
+    behaviour_mapping = ''.join(f'{rm}\n' for rm in content['Behaviour'][height:])
+    rewards_mappings = ''.join(f'{rm}\n' for rm in content['Rewards'][height:])
 
-    rewards_layout = [list(line) for line in content['Rewards']][:len(layout)]
-    rewards_mappings = ''
-    for rm in content['Rewards'][len(layout):]:
-        rewards_mappings += f'{rm}\n'
+    return layout, abstraction_layout, abstraction_mappings, behaviour_layout, behaviour_mapping, rewards_layout, rewards_mappings
 
-    for l in [layout, abstraction_layout, behaviour_layout, rewards_layout]:
-        if not l:
-            continue
-        l.pop(0)
-        l.pop()
-        for line in l:
-            line.pop(0)
-            line.pop()
 
-    return layout, abstraction_layout, abstraction_mappings, behaviour_layout, behaviour_mapping, rewards_layout, rewards_mappings
+def _find(rows, tile, last=False):
+    # (row, column) of the first (or last) occurrence of tile in row-major order, None if there is none
+    indices = range(len(rows) - 1, -1, -1) if last else range(len(rows))
+    for x in indices:
+        y = rows[x].rfind(tile) if last else rows[x].find(tile)
+        if y >= 0:
+            return x, y
+    return None
+
+
+def _write_section(file, rows, height, repeat_x, repeat_y, kept_tiles=()):
+    """
+    Writes rows tiled repeat_x times horizontally and repeat_y times vertically, surrounded by walls.
+    Scaled rows are produced one at a time from the source rows, so memory does not grow with repeat_y.
+    kept_tiles holds (scaled row, scaled column, tile) of tiles that are restored after removing them from all rows.
+    """
+    rows = [''.join(row) for row in rows]
+    width = len(rows[0]) * repeat_x
+    kept = defaultdict(list)
+    for x, y, tile in kept_tiles:
+        kept[x].append((y, tile))
+
+    wall = '#' * (width + 2) + '\n'
+    file.write(wall)
+    for x in range(repeat_y * height):
+        row = rows[x % height] * repeat_x
+        for y, tile in kept.get(x, []):
+            row = row[:y] + tile + row[y + 1:]
+        file.write(f'#{row}#\n')
+    file.write(wall)
 
 
 def create_world(file_name, parsed_values, repeat_x, repeat_y):
+    """
+    Writes a world that repeats the interior of a parsed world repeat_x times horizontally and repeat_y times
+    vertically. Only the first initial location and the last goal (in row-major order) of the scaled world are kept.
+    """
     layout, abstraction_layout, abstraction_mappings, rules_layout, rules_mappings, rewards_layout, rewards_mappings = parsed_values
-
-    layout_world = []
-    abstract_world = []
-    behaviour_world = []
-    rewards_world = []
-
-    for world, word_list in [(layout_world, layout), (abstract_world, abstraction_layout),
-                             (behaviour_world, rules_layout), (rewards_world, rewards_layout)]:
-        if not word_list:
-            continue
-
-        curr_row = 0
-        last_row = repeat_y * len(layout) - 1
-        for r_y in range(repeat_y * len(layout)):
-
-            line = []
-            for x in range(repeat_x):
-                line.extend(word_list[curr_row % len(layout)])
-
-            world.append(line)
-
-            curr_row += 1
-
-        for line in world:
-            line.insert(0, '#')
-            line.append('#')
-
-        e_set, last_g_location = False, None
-        for x, line in enumerate(layout_world):
-            for y, tile in enumerate(line):
-                if tile == 'G':
-                    last_g_location = (x, y)
-
-        for x, line in enumerate(layout_world):
-            for y, tile in enumerate(line):
-                if tile == 'E':
-                    if not e_set:
-                        e_set = True
-                        continue
-                    else:
-                        layout_world[x][y] = ' '
-                if tile == 'G' and (x, y) != last_g_location:
-                    layout_world[x][y] = ' '
-
-        top_bottom_line = ['#' for _ in range(len(world[0]))]
-        world.insert(0, top_bottom_line)
-        world.append(top_bottom_line)
+    height = len(layout)
+
+    # Remove initial locations and goals from the source rows, and restore the unique ones while writing
+    layout = [''.join(row) for row in layout]
+    kept_tiles = []
+    first_e, last_g = _find(layout, 'E'), _find(layout, 'G', last=True)
+    if first_e is not None:
+        kept_tiles.append((first_e[0], first_e[1], 'E'))
+    if last_g is not None:
+        width = len(layout[last_g[0]])
+        kept_tiles.append(((repeat_y - 1) * height + last_g[0], (repeat_x - 1) * width + last_g[1], 'G'))
+    layout = [row.replace('E', ' ').replace('G', ' ') for row in layout]
 
     with open(file_name, 'w') as file:
 
         file.write('===Layout===\n\n')
-        for l in layout_world:
-            file.write(''.join(l)+'\n')
+        _write_section(file, layout, height, repeat_x, repeat_y, kept_tiles)
 
         file.write('\n')
 
-        if abstract_world:
+        if abstraction_layout:
             file.write('===Abstraction===\n\n')
-            for l in abstract_world:
-                file.write(''.join(l)+'\n')
+            _write_section(file, abstraction_layout, height, repeat_x, repeat_y)
             file.write('\n' + abstraction_mappings + '\n')
 
-        if behaviour_world:
+        if rules_layout:
             file.write('===Behaviour===\n\n')
-            for l in behaviour_world:
-                file.write(''.join(l)+'\n')
+            _write_section(file, rules_layout, height, repeat_x, repeat_y)
             file.write('\n' + rules_mappings + '\n')
 
-        if rewards_world:
+        if rewards_layout:
             file.write('===Rewards===\n\n')
-            for l in rewards_world:
-                file.write(''.join(l)+'\n')
+            _write_section(file, rewards_layout, height, repeat_x, repeat_y)
             file.write('\n' + rewards_mappings + '\n')
 
 
 if __name__ == '__main__':
-    p = parse_file('worlds/world0.txt')
-    create_world('worlds/scaled_world0.txt', p, 3, 2)
+    arg_parser = argparse.ArgumentParser(description='Scale a world by repeating its interior.')
+    arg_parser.add_argument('world', nargs='?', default='worlds/world0.txt', help='World file to scale')
+    arg_parser.add_argument('output', nargs='?', default='worlds/scaled_world0.txt', help='Scaled world file')
+    arg_parser.add_argument('-x', '--repeat-x', type=int, default=3, help='Horizontal repeats')
+    arg_parser.add_argument('-y', '--repeat-y', type=int, default=2, help='Vertical repeats')
+    args = arg_parser.parse_args()
+
+    create_world(args.output, parse_file(args.world), args.repeat_x, args.repeat_y)